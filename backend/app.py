@@ -8,6 +8,11 @@ from services.risk_routes import router as risk_router
 from services.summary_routes import router as summary_router
 from services.compare_routes import router as compare_router
 from services.files_routes import router as files_router
+from nlp.query_embed import QUERY_CACHE
+from nlp.embed_cache import EMBED_CACHE, SENTENCE_CACHE
+from nlp.extract_text import OCR_CACHE
+from services.risk import SENTIMENT_CACHE
+from nlp.summarize import SUMMARY_CACHE
 
 
 
@@ -32,6 +37,17 @@ def _startup():
 def health():
     return {"status": "ok"}
 
+@app.get("/metrics")
+def metrics():
+    return {
+        "query_embedding_cache": QUERY_CACHE.stats(),
+        "chunk_embedding_cache": EMBED_CACHE.stats(),
+        "sentence_embedding_cache": SENTENCE_CACHE.stats(),
+        "ocr_cache": OCR_CACHE.stats(),
+        "sentiment_cache": SENTIMENT_CACHE.stats(),
+        "summary_cache": SUMMARY_CACHE.stats(),
+    }
+
 # Routes
 app.include_router(upload_router, prefix="")
 app.include_router(qa_router, prefix="")
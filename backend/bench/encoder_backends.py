@@ -0,0 +1,56 @@
+"""
+MiniLM encoder backends: parity against fp32 and throughput (chunks/sec).
+
+    python -m bench.encoder_backends [--file-ids <id> ...] [--backends onnx,onnx-int8]
+
+Chunks come from ingested documents when file ids are given, otherwise the
+built-in parity samples are repeated. onnx backends need onnxruntime.
+"""
+import argparse
+import time
+
+from nlp.encoder_backends import BACKENDS, PARITY_MIN_COSINE, PARITY_SAMPLES, _build, parity
+
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+def load_chunks(file_ids: list[str]) -> list[str]:
+    from services.embedding import chunk_text, load_sections
+    return [c["text"] for fid in file_ids for c in chunk_text(load_sections(fid))]
+
+
+def throughput(model, texts: list[str], batch_size: int) -> float:
+    model.encode(texts[:batch_size], batch_size=batch_size, convert_to_numpy=True)  # warmup
+    t0 = time.perf_counter()
+    model.encode(texts, batch_size=batch_size, convert_to_numpy=True, normalize_embeddings=True)
+    return len(texts) / (time.perf_counter() - t0)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--file-ids", nargs="*", default=[])
+    ap.add_argument("--backends", default=",".join(BACKENDS))
+    ap.add_argument("--batch-size", type=int, default=32)
+    ap.add_argument("--limit", type=int, default=2000, help="max chunks to encode")
+    args = ap.parse_args()
+
+    texts = load_chunks(args.file_ids) if args.file_ids else PARITY_SAMPLES * 100
+    texts = texts[:args.limit]
+    reference = _build(MODEL_NAME, "torch")
+    print(f"{len(texts)} chunks, batch size {args.batch_size}, parity threshold {PARITY_MIN_COSINE}")
+
+    for backend in args.backends.split(","):
+        try:
+            model = reference if backend == "torch" else _build(MODEL_NAME, backend)
+        except ImportError as e:
+            print(f"  {backend:<11} unavailable: {e}")
+            continue
+        p = parity(model, reference, texts)
+        ok = "PASS" if p["min_cosine"] >= PARITY_MIN_COSINE else "FAIL"
+        cps = throughput(model, texts, args.batch_size)
+        print(f"  {backend:<11} {cps:8.1f} chunks/s   min cos {p['min_cosine']:.4f}   "
+              f"mean cos {p['mean_cosine']:.4f}   {ok}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Pages/sec for each extraction backend on sample PDFs.
+
+    python -m bench.extract_backends data/raw/*.pdf
+
+Raw backends run in-process; 'auto' is the production path (isolated
+worker, primary backend plus per-page pdfplumber/OCR fallback).
+"""
+import argparse
+import time
+from collections import Counter
+
+from nlp.extractors import DEFAULT_BACKEND, EXTRACTORS, assess_text, open_extractor
+from nlp.extract_text import iter_pages
+
+
+def bench_backend(name: str, pdf_path: str) -> dict:
+    t0 = time.perf_counter()
+    ex = open_extractor(name, pdf_path)
+    n, chars, quality = len(ex), 0, Counter()
+    for i in range(n):
+        text = ex.page_text(i)
+        chars += len(text)
+        quality[assess_text(text)] += 1
+    ex.close()
+    dt = time.perf_counter() - t0
+    return {"pages": n, "seconds": dt, "chars": chars, "quality": dict(quality)}
+
+
+def bench_auto(pdf_path: str) -> dict:
+    t0 = time.perf_counter()
+    n, chars, sources = 0, 0, Counter()
+    for page in iter_pages(pdf_path, backend=DEFAULT_BACKEND):
+        n += 1
+        chars += len(page["text"])
+        sources[page["source"]] += 1
+    dt = time.perf_counter() - t0
+    return {"pages": n, "seconds": dt, "chars": chars, "sources": dict(sources)}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("pdfs", nargs="+", help="sample PDF files")
+    ap.add_argument("--backends", default=",".join(list(EXTRACTORS) + ["auto"]),
+                    help="comma-separated subset of: %(default)s")
+    args = ap.parse_args()
+
+    totals: dict[str, list[float]] = {}
+    for pdf in args.pdfs:
+        print(f"\n{pdf}")
+        for name in args.backends.split(","):
+            r = bench_auto(pdf) if name == "auto" else bench_backend(name, pdf)
+            pps = r["pages"] / max(r["seconds"], 1e-9)
+            extra = r.get("sources") or r.get("quality")
+            print(f"  {name:<11} {r['pages']:>5} pages  {r['seconds']:8.2f}s  {pps:8.1f} pages/s  "
+                  f"{r['chars']:>9} chars  {extra}")
+            t = totals.setdefault(name, [0, 0.0])
+            t[0] += r["pages"]
+            t[1] += r["seconds"]
+
+    print("\nOverall")
+    for name, (pages, secs) in totals.items():
+        print(f"  {name:<11} {pages / max(secs, 1e-9):8.1f} pages/s")
+
+
+if __name__ == "__main__":
+    main()
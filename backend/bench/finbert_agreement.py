@@ -0,0 +1,62 @@
+"""
+FinBERT backend agreement with fp32 labels, plus sentences/sec.
+
+    python -m bench.finbert_agreement <file_id> [...] [--backends torch-int8,onnx,onnx-int8]
+
+Scores the Risk Factors sentences of each file with the fp32 reference and
+with every listed backend. onnx backends need onnxruntime.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from nlp.batching import run_batched, token_lengths
+from services.finbert import BACKENDS, FINBERT_THREADS, LABELS, MAX_LENGTH, FinBERT
+
+
+def load_sentences(file_ids: list[str]) -> list[str]:
+    from services.risk import load_risk_sentences
+    out = []
+    for fid in file_ids:
+        out.extend(load_risk_sentences(fid))
+    return out
+
+
+def score(fb: FinBERT, sentences: list[str]) -> tuple[np.ndarray, float]:
+    lengths = token_lengths(sentences, fb.tokenizer, MAX_LENGTH)
+    t0 = time.perf_counter()
+    probs = run_batched(sentences, fb.predict, lengths, 2048, 64)
+    return np.vstack(probs), time.perf_counter() - t0
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("file_ids", nargs="+")
+    ap.add_argument("--backends", default=",".join(b for b in BACKENDS if b != "torch"))
+    ap.add_argument("--threads", type=int, default=FINBERT_THREADS)
+    args = ap.parse_args()
+
+    sentences = load_sentences(args.file_ids)
+    ref, ref_s = score(FinBERT("torch", threads=args.threads), sentences)
+    ref_labels = ref.argmax(axis=1)
+    print(f"{len(sentences)} sentences; torch fp32: {len(sentences) / ref_s:.1f} sentences/s")
+    print("  fp32 label mix: " + ", ".join(
+        f"{LABELS[i]} {np.mean(ref_labels == i):.1%}" for i in range(len(LABELS))))
+
+    for backend in args.backends.split(","):
+        try:
+            fb = FinBERT(backend, threads=args.threads)
+        except ImportError as e:
+            print(f"  {backend:<11} unavailable: {e}")
+            continue
+        probs, secs = score(fb, sentences)
+        labels = probs.argmax(axis=1)
+        neg_flips = int(np.sum((labels == 1) != (ref_labels == 1)))
+        print(f"  {backend:<11} {len(sentences) / secs:8.1f} sentences/s ({ref_s / secs:.2f}x)  "
+              f"label agreement {np.mean(labels == ref_labels):.2%}  "
+              f"negative flips {neg_flips}  max |Δp| {np.abs(probs - ref).max():.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Padding waste of document-order vs length-bucketed batching for the
+encoder, FinBERT and the section summarizer, on ingested documents.
+
+    python -m bench.padding_waste <file_id> [<file_id> ...]
+
+Only tokenizers are loaded; no model is run.
+"""
+import argparse
+import json
+from pathlib import Path
+
+from transformers import AutoTokenizer
+
+from nlp.batching import length_batches, padding_waste, sequential_batches, token_lengths
+from nlp.embed_cache import ENCODE_MAX_TOKENS
+from nlp.sentences import split_sentences
+
+CORPUS_DIR = Path("data/corpus")
+
+# (name, tokenizer, max input tokens, old batch size, new max batch size, token budget)
+CONSUMERS = [
+    ("encoder", "sentence-transformers/all-MiniLM-L6-v2", 256, 32, 32, ENCODE_MAX_TOKENS),
+    ("finbert", "yiyanghkust/finbert-tone", 128, 8, 64, 2048),
+    ("summarizer", "facebook/bart-large-cnn", 1024, 1, 8, 8192),
+]
+
+
+def load_items(file_id: str) -> dict:
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    with open(CORPUS_DIR / f"{file_id}.jsonl", "r", encoding="utf-8") as f:
+        sections = [json.loads(line) for line in f]
+    splitter = RecursiveCharacterTextSplitter(chunk_size=1200, chunk_overlap=150)
+    risk = "\n".join(s["text"] for s in sections if s["section"].lower().startswith("risk"))
+    return {
+        "encoder": [c for s in sections for c in splitter.split_text(s["text"])],
+        "finbert": split_sentences(risk),
+        "summarizer": [s["text"].replace("\n", " ")[:12000] for s in sections],
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("file_ids", nargs="+")
+    args = ap.parse_args()
+
+    items = {name: [] for name, *_ in CONSUMERS}
+    for fid in args.file_ids:
+        for name, texts in load_items(fid).items():
+            items[name].extend(texts)
+
+    for name, tok_name, max_len, old_bs, new_bs, budget in CONSUMERS:
+        texts = items[name]
+        if not texts:
+            print(f"{name:<11} no inputs")
+            continue
+        lengths = token_lengths(texts, AutoTokenizer.from_pretrained(tok_name), max_len)
+        before = padding_waste(lengths, sequential_batches(len(lengths), old_bs))
+        after = padding_waste(lengths, length_batches(lengths, budget, new_bs))
+        print(f"{name:<11} {len(texts):>6} inputs | document order: {before['batches']:>5} batches, "
+              f"{before['padded_tokens']:>9} padded tokens, waste {before['waste']:.1%} | "
+              f"bucketed: {after['batches']:>5} batches, {after['padded_tokens']:>9} padded tokens, "
+              f"waste {after['waste']:.1%}")
+
+
+if __name__ == "__main__":
+    main()
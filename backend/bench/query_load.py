@@ -0,0 +1,57 @@
+"""
+Query-embedding latency under concurrent load: one encode per request
+(the old path) vs the shared micro-batcher.
+
+    python -m bench.query_load --threads 16 --requests 50
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+from nlp.query_embed import QueryBatcher
+
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+QUERIES = [
+    "What is the issue size?", "Who are the promoters?", "What are the objects of the issue?",
+    "What is the price band?", "Summarize the key risk factors", "What is the revenue from operations?",
+    "Are there any outstanding litigations against the company?", "Who are the book running lead managers?",
+]
+
+
+def run(fn, threads: int, requests: int) -> np.ndarray:
+    def one(i):
+        t0 = time.perf_counter()
+        fn(QUERIES[i % len(QUERIES)] + f" ({i})")
+        return (time.perf_counter() - t0) * 1000
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        return np.array(list(pool.map(one, range(threads * requests))))
+
+
+def report(name: str, ms: np.ndarray):
+    print(f"  {name:<10} p50 {np.percentile(ms, 50):7.1f} ms   p99 {np.percentile(ms, 99):7.1f} ms")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--threads", type=int, default=16)
+    ap.add_argument("--requests", type=int, default=50, help="requests per thread")
+    args = ap.parse_args()
+
+    model = SentenceTransformer(MODEL_NAME)
+    batcher = QueryBatcher(model)
+    direct = lambda q: model.encode([q], convert_to_numpy=True, normalize_embeddings=True)
+    direct("warmup")
+    batcher.encode("warmup")
+
+    for threads in (1, args.threads):
+        print(f"{threads} concurrent client(s)")
+        report("direct", run(direct, threads, args.requests))
+        report("batched", run(batcher.encode, threads, args.requests))
+
+
+if __name__ == "__main__":
+    main()
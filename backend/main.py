@@ -4,13 +4,16 @@ from pydantic import BaseModel
 import os, uuid, json, re
 from typing import List, Dict, Any
 
-from nlp.extract_text import extract_text_from_pdf
+from nlp.extract_text import iter_text_from_pdf
 from nlp.chunking import chunk_pages
 from nlp.embeddings import EmbeddingStore
-from nlp.summarize import HierarchicalSummarizer
+from nlp.summarize import HierarchicalSummarizer, SUMMARY_CACHE
 from nlp.rag import RAGAnswerer
-from nlp.utils import ensure_dir
+from nlp.utils import ensure_dir, peak_rss_mb
 from nlp.metrics import extract_metrics_from_text  # regex-based extraction
+from nlp.query_embed import QUERY_CACHE
+from nlp.embed_cache import EMBED_CACHE, SENTENCE_CACHE
+from nlp.extract_text import OCR_CACHE
 
 # ----- paths & app -----
 BASE_DIR = os.path.dirname(__file__)
@@ -40,10 +43,12 @@ class UploadResponse(BaseModel):
     doc_id: str
     pages: int
     chunks: int
+    peak_rss_mb: Dict[str, Any] = {}
 
 class SummarizeRequest(BaseModel):
     doc_id: str
     max_words: int = 300
+    force: bool = False
 
 class AskRequest(BaseModel):
     doc_id: str
@@ -63,6 +68,16 @@ class CompareRequest(BaseModel):
 def health():
     return {"status": "ok"}
 
+@app.get("/metrics")
+def metrics():
+    return {
+        "query_embedding_cache": QUERY_CACHE.stats(),
+        "chunk_embedding_cache": EMBED_CACHE.stats(),
+        "sentence_embedding_cache": SENTENCE_CACHE.stats(),
+        "ocr_cache": OCR_CACHE.stats(),
+        "summary_cache": SUMMARY_CACHE.stats(),
+    }
+
 # ----- helpers -----
 def _find_page_for_snippet(pages_text: List[str], snippet: str) -> int | None:
     """Naively map a snippet back to the first page containing its first ~120 chars."""
@@ -92,6 +107,35 @@ def _extract_metrics_from_doc_dir(doc_dir: str) -> Dict[str, str]:
 
     return extract_metrics_from_text(text)
 
+class _PageSpiller:
+    """
+    Writes pages.json as a JSON array while pages stream through to the
+    chunker. The array goes to a temp file that replaces pages.json only
+    once every page is written, so readers never see a partial file.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.count = 0
+
+    def __call__(self, pages):
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write("[")
+                for text in pages:
+                    if self.count:
+                        f.write(", ")
+                    json.dump(text, f, ensure_ascii=False)
+                    self.count += 1
+                    yield text
+                f.write("]")
+        except BaseException:
+            # extraction failed or the consumer stopped early: leave no partial pages.json
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        os.replace(tmp, self.path)
+
 # ----- routes -----
 @app.post("/upload", response_model=UploadResponse)
 async def upload(file: UploadFile = File(...)):
@@ -104,15 +148,11 @@ async def upload(file: UploadFile = File(...)):
     with open(pdf_path, "wb") as f:
         f.write(await file.read())
 
-    # per-page text (OCR fallback inside)
-    pages_text: List[str] = extract_text_from_pdf(pdf_path)
-
-    # persist raw text
-    with open(os.path.join(doc_dir, "pages.json"), "w", encoding="utf-8") as f:
-        json.dump(pages_text, f, ensure_ascii=False)
+    # per-page text (OCR fallback inside), persisted to pages.json as it streams
+    spill = _PageSpiller(os.path.join(doc_dir, "pages.json"))
 
     # page-aware chunking WITH metadata (e.g., {"text": ..., "page": ...})
-    chunks_with_meta: List[Dict[str, Any]] = chunk_pages(pages_text)
+    chunks_with_meta: List[Dict[str, Any]] = chunk_pages(spill(iter_text_from_pdf(pdf_path)))
     with open(os.path.join(doc_dir, "chunks.json"), "w", encoding="utf-8") as f:
         json.dump(chunks_with_meta, f, ensure_ascii=False)
 
@@ -121,7 +161,9 @@ async def upload(file: UploadFile = File(...)):
     store.index_chunks(chunks_with_meta)
     store.save()
 
-    return UploadResponse(doc_id=doc_id, pages=len(pages_text), chunks=len(chunks_with_meta))
+    return UploadResponse(
+        doc_id=doc_id, pages=spill.count, chunks=len(chunks_with_meta), peak_rss_mb=peak_rss_mb()
+    )
 
 @app.post("/summarize")
 def summarize(req: SummarizeRequest):
@@ -137,7 +179,7 @@ def summarize(req: SummarizeRequest):
         _summarizer = HierarchicalSummarizer()
 
     texts = [c["text"] for c in chunks]
-    summary = _summarizer.hierarchical_summarize(texts, target_words=req.max_words)
+    summary = _summarizer.hierarchical_summarize(texts, target_words=req.max_words, force=req.force)
 
     with open(os.path.join(doc_dir, "summary.txt"), "w", encoding="utf-8") as f:
         f.write(summary)
@@ -10,6 +10,8 @@ class UploadCompleteReq(BaseModel):
     file_id: str
     filename: str
     total_chunks: int
+    # earlier version of the same prospectus (e.g. the DRHP when uploading the RHP)
+    previous_file_id: Optional[str] = None
 
 
 class JobStatusResp(BaseModel):
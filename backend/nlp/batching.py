@@ -0,0 +1,68 @@
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+
+def token_lengths(texts: Sequence[str], tokenizer=None, max_length: Optional[int] = None) -> List[int]:
+    """
+    Token count per text (capped at max_length, as the model will truncate).
+    Without a tokenizer, falls back to a words * 1.3 estimate.
+    """
+    if not texts:
+        return []
+    if tokenizer is None:
+        lens = [int(len(t.split()) * 1.3) + 2 for t in texts]
+    else:
+        enc = tokenizer(list(texts), add_special_tokens=True, truncation=max_length is not None,
+                        max_length=max_length)
+        lens = [len(ids) for ids in enc["input_ids"]]
+    if max_length is not None:
+        lens = [min(n, max_length) for n in lens]
+    return [max(n, 1) for n in lens]
+
+
+def length_batches(lengths: Sequence[int], max_tokens: int, max_batch_size: int = 64) -> List[List[int]]:
+    """
+    Group item indices into batches of similar length. Items are sorted
+    longest first and a batch grows while batch_size * longest_item stays
+    within `max_tokens` (the padded tensor size), so short items share
+    batches with short items instead of being padded to a long neighbour.
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i], reverse=True)
+    batches: List[List[int]] = []
+    cur: List[int] = []
+    for i in order:
+        longest = lengths[cur[0]] if cur else lengths[i]
+        if cur and ((len(cur) + 1) * longest > max_tokens or len(cur) >= max_batch_size):
+            batches.append(cur)
+            cur = []
+        cur.append(i)
+    if cur:
+        batches.append(cur)
+    return batches
+
+
+def run_batched(items: Sequence[Any], fn: Callable[[List[Any]], Sequence[Any]], lengths: Sequence[int],
+                max_tokens: int, max_batch_size: int = 64) -> List[Any]:
+    """Apply `fn` to length-bucketed batches of `items`; results come back in input order."""
+    results: List[Any] = [None] * len(items)
+    for batch in length_batches(lengths, max_tokens, max_batch_size):
+        outs = fn([items[i] for i in batch])
+        for i, out in zip(batch, outs):
+            results[i] = out
+    return results
+
+
+def padding_waste(lengths: Sequence[int], batches: Sequence[Sequence[int]]) -> Dict[str, float]:
+    """Share of padded tensor positions that are padding, for a given batching."""
+    real = sum(lengths[i] for b in batches for i in b)
+    padded = sum(len(b) * max(lengths[i] for i in b) for b in batches if b)
+    return {
+        "batches": len(batches),
+        "real_tokens": real,
+        "padded_tokens": padded,
+        "waste": round(1 - real / padded, 3) if padded else 0.0,
+    }
+
+
+def sequential_batches(n: int, batch_size: int) -> List[List[int]]:
+    """Document-order batching (what the callers did before), for comparison."""
+    return [list(range(i, min(i + batch_size, n))) for i in range(0, n, batch_size)]
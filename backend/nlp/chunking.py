@@ -1,5 +1,5 @@
 import re
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable
 
 def chunk_text(text: str, target_words: int = 850, overlap_words: int = 80) -> List[str]:
     """
@@ -18,7 +18,7 @@ def chunk_text(text: str, target_words: int = 850, overlap_words: int = 80) -> L
         i += step
     return chunks
 
-def chunk_pages(pages: List[str], target_words: int = 850, overlap_words: int = 80) -> List[Dict[str, Any]]:
+def chunk_pages(pages: Iterable[str], target_words: int = 850, overlap_words: int = 80) -> List[Dict[str, Any]]:
     """
     Page-aware chunking. Returns list of dicts:
     [{ 'text': str, 'page': int, 'chunk_idx': int }, ...]
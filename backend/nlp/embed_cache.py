@@ -0,0 +1,76 @@
+import hashlib
+import os
+import re
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from store.cache import KVCache, CACHE_DIR
+from nlp.batching import length_batches, token_lengths
+
+# Padded-tensor budget per encoder batch (MiniLM truncates at 256 tokens)
+ENCODE_MAX_TOKENS = int(os.environ.get("ENCODE_MAX_TOKENS", "8192"))
+
+# Content-addressed chunk embeddings shared by every document and both pipelines
+EMBED_CACHE = KVCache(
+    CACHE_DIR / "embeddings.db", max_bytes=int(os.environ.get("EMBED_CACHE_MB", "512")) * 1024 * 1024
+)
+# Sentence embeddings for extractive pre-selection, kept apart so they cannot evict chunk vectors
+SENTENCE_CACHE = KVCache(
+    CACHE_DIR / "sentence_embeddings.db",
+    max_bytes=int(os.environ.get("SENTENCE_EMBED_CACHE_MB", "256")) * 1024 * 1024,
+)
+
+_WS = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    return _WS.sub(" ", text).strip()
+
+
+def cache_key(model_name: str, text: str) -> str:
+    return model_name + ":" + hashlib.sha1(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+def encode_cached(model, model_name: str, texts: List[str], batch_size: int = 32,
+                  checkpoint: Optional[Callable[[], None]] = None,
+                  stats: Optional[Dict] = None, cache: KVCache = EMBED_CACHE) -> np.ndarray:
+    """
+    L2-normalized float32 embeddings for `texts`. Vectors are looked up by
+    (model, normalized text hash) first; only unseen texts reach the encoder,
+    in length-bucketed batches of at most `batch_size` texts and
+    ENCODE_MAX_TOKENS padded tokens, and their vectors are stored as
+    float16 in `cache`. `checkpoint` runs before every encoder batch (e.g.
+    to honour job cancellation).
+    """
+    dim = model.get_sentence_embedding_dimension()
+    out = np.zeros((len(texts), dim), dtype="float32")
+    keys = [cache_key(model_name, t) for t in texts]
+    hits = cache.get_many(list(set(keys)))
+
+    todo: Dict[str, List[int]] = {}  # key -> positions, so duplicates encode once
+    for i, k in enumerate(keys):
+        if k in hits:
+            out[i] = np.frombuffer(hits[k], dtype="float16")
+        else:
+            todo.setdefault(k, []).append(i)
+
+    pending = list(todo)
+    pending_texts = [texts[todo[k][0]] for k in pending]
+    lengths = token_lengths(pending_texts, getattr(model, "tokenizer", None), model.get_max_seq_length())
+    for idx in length_batches(lengths, ENCODE_MAX_TOKENS, batch_size):
+        if checkpoint is not None:
+            checkpoint()
+        batch = [pending[i] for i in idx]
+        vecs = model.encode(
+            [pending_texts[i] for i in idx], batch_size=len(idx),
+            show_progress_bar=False, convert_to_numpy=True, normalize_embeddings=True,
+        )
+        for k, v in zip(batch, vecs):
+            out[todo[k]] = v
+        cache.put_many({k: v.astype("float16").tobytes() for k, v in zip(batch, vecs)})
+
+    if stats is not None:
+        stats["embed_cache_hits"] = len(texts) - sum(len(v) for v in todo.values())
+        stats["embed_encoded"] = len(pending)
+    return out
@@ -1,15 +1,30 @@
 import os
 import json
 from typing import List, Dict, Any, Union
-from sentence_transformers import SentenceTransformer
 import faiss
 import numpy as np
 
+from nlp.embed_cache import encode_cached
+from nlp.query_embed import encode_query
+from nlp.encoder_backends import encoder_key, load_encoder
+
+EMBED_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+# one model instance per process, shared by every store (and query batcher)
+_MODELS: Dict[str, tuple] = {}
+
+def _get_model(model_name: str):
+    """(model, cache key) for the configured encoder backend, loaded once."""
+    if model_name not in _MODELS:
+        model, backend = load_encoder(model_name)
+        _MODELS[model_name] = (model, encoder_key(model_name, backend))
+    return _MODELS[model_name]
+
 class EmbeddingStore:
     def __init__(self, doc_dir: str):
         self.doc_dir = doc_dir
-        self.model_name = "sentence-transformers/all-MiniLM-L6-v2"
-        self.model = SentenceTransformer(self.model_name)
+        self.model_name = EMBED_MODEL_NAME
+        self.model, self.model_key = _get_model(self.model_name)
         self.index = None
         self.texts: List[str] = []
         self.metas: List[Dict[str, Any]] = []
@@ -47,8 +62,8 @@ class EmbeddingStore:
             self.texts = list(chunks)
             self.metas = [{"page": None, "chunk_idx": i} for i in range(len(self.texts))]
 
-        embs = self.model.encode(self.texts, batch_size=64, convert_to_numpy=True, show_progress_bar=False)
-        faiss.normalize_L2(embs)
+        # already L2-normalized; only chunks not seen before reach the model
+        embs = encode_cached(self.model, self.model_key, self.texts, batch_size=64)
         dim = embs.shape[1]
         self.index = faiss.IndexFlatIP(dim)
         self.index.add(embs)
@@ -67,8 +82,7 @@ class EmbeddingStore:
         self.metas = meta.get("metas", [{"page": None, "chunk_idx": i} for i in range(len(self.texts))])
 
     def search(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
-        q = self.model.encode([query], convert_to_numpy=True)
-        faiss.normalize_L2(q)
+        q = encode_query(self.model, self.model_key, query)
         D, I = self.index.search(q, top_k)
         results = []
         for score, idx in zip(D[0], I[0]):
@@ -0,0 +1,148 @@
+import os
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+# torch (fp32 eager, default) | torch-int8 | onnx | onnx-int8
+EMBED_BACKEND = os.environ.get("EMBED_BACKEND", "torch")
+EMBED_PARITY_CHECK = os.environ.get("EMBED_PARITY_CHECK", "1") != "0"
+PARITY_MIN_COSINE = float(os.environ.get("EMBED_PARITY_MIN_COSINE", "0.99"))
+ONNX_DIR = Path("data/models")
+BACKENDS = ("torch", "torch-int8", "onnx", "onnx-int8")
+
+# Sanity-check sentences for the load-time parity check
+PARITY_SAMPLES = [
+    "The Offer comprises a fresh issue of equity shares aggregating up to ₹500 crore.",
+    "Our business is subject to extensive regulation and we may be adversely affected by changes in law.",
+    "The Promoters of our Company are Mr. R. Sharma and Sharma Holdings Private Limited.",
+    "Investors are advised to read the risk factors carefully before taking an investment decision.",
+    "Revenue from operations increased by 18.2% to ₹1,204.5 crore in Fiscal 2024.",
+    "what is the issue size",
+]
+
+
+def encoder_key(model_name: str, backend: str = EMBED_BACKEND) -> str:
+    """Cache key for vectors from this model/backend pair (fp32 torch keeps the bare name)."""
+    return model_name if backend == "torch" else f"{model_name}@{backend}"
+
+
+class OnnxEncoder:
+    """
+    Drop-in for the subset of SentenceTransformer used here (encode, tokenizer,
+    dimension/max length), running the exported transformer on ONNX Runtime
+    with the same mean pooling as all-MiniLM-L6-v2.
+    """
+
+    def __init__(self, st_model: SentenceTransformer, onnx_path: Path):
+        import onnxruntime as ort
+
+        self.tokenizer = st_model.tokenizer
+        self._dim = st_model.get_sentence_embedding_dimension()
+        self._max_len = st_model.get_max_seq_length()
+        opts = ort.SessionOptions()
+        threads = int(os.environ.get("ORT_INTRA_OP_THREADS", "0"))
+        if threads:
+            opts.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(str(onnx_path), opts, providers=["CPUExecutionProvider"])
+        self._inputs = {i.name for i in self.session.get_inputs()}
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self._dim
+
+    def get_max_seq_length(self) -> int:
+        return self._max_len
+
+    def encode(self, texts: List[str], batch_size: int = 32, convert_to_numpy: bool = True,
+               normalize_embeddings: bool = False, show_progress_bar: bool = False) -> np.ndarray:
+        if isinstance(texts, str):
+            texts = [texts]
+        out = []
+        for i in range(0, len(texts), batch_size):
+            enc = self.tokenizer(texts[i:i + batch_size], padding=True, truncation=True,
+                                 max_length=self._max_len, return_tensors="np")
+            feed = {k: v.astype(np.int64) for k, v in enc.items() if k in self._inputs}
+            hidden = self.session.run(["last_hidden_state"], feed)[0]
+            mask = enc["attention_mask"][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            out.append(pooled)
+        embs = np.vstack(out).astype(np.float32) if out else np.zeros((0, self._dim), np.float32)
+        if normalize_embeddings:
+            embs /= np.clip(np.linalg.norm(embs, axis=1, keepdims=True), 1e-12, None)
+        return embs
+
+
+def export_onnx(module, tokenizer, model_name: str, quantize: bool, output: str = "last_hidden_state",
+                output_axes: Optional[dict] = None) -> Path:
+    """
+    Export (once) a transformers `module` fed by `tokenizer` to ONNX,
+    optionally int8-quantized; returns the path. Its first output is named
+    `output`, with dynamic `output_axes` (default: batch and sequence).
+    """
+    import torch
+
+    ONNX_DIR.mkdir(parents=True, exist_ok=True)
+    base = ONNX_DIR / (model_name.replace("/", "__") + ".onnx")
+    if not base.exists():
+        dummy = tokenizer(["export"], return_tensors="pt")
+        names = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in dummy]
+        axes = {n: {0: "batch", 1: "seq"} for n in names}
+        axes[output] = output_axes or {0: "batch", 1: "seq"}
+        with torch.no_grad():
+            torch.onnx.export(
+                module.eval(), tuple(dummy[n] for n in names), str(base),
+                input_names=names, output_names=[output],
+                dynamic_axes=axes, opset_version=14,
+            )
+    if not quantize:
+        return base
+    qpath = base.with_name(base.stem + ".int8.onnx")
+    if not qpath.exists():
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(str(base), str(qpath), weight_type=QuantType.QInt8)
+    return qpath
+
+
+def _build(model_name: str, backend: str):
+    st_model = SentenceTransformer(model_name, device="cpu")
+    if backend == "torch":
+        return st_model
+    if backend == "torch-int8":
+        import torch
+        return torch.quantization.quantize_dynamic(st_model, {torch.nn.Linear}, dtype=torch.qint8)
+    if backend in ("onnx", "onnx-int8"):
+        path = export_onnx(st_model[0].auto_model, st_model.tokenizer, model_name, quantize=backend == "onnx-int8")
+        return OnnxEncoder(st_model, path)
+    raise ValueError(f"Unknown EMBED_BACKEND {backend!r}; expected one of {BACKENDS}")
+
+
+def parity(model, reference, texts: List[str]) -> dict:
+    """Cosine similarity between `model` and fp32 `reference` embeddings of `texts`."""
+    a = model.encode(texts, convert_to_numpy=True, normalize_embeddings=True)
+    b = reference.encode(texts, convert_to_numpy=True, normalize_embeddings=True)
+    cos = (a * b).sum(axis=1)
+    return {"min_cosine": float(cos.min()), "mean_cosine": float(cos.mean())}
+
+
+def load_encoder(model_name: str, backend: str = EMBED_BACKEND):
+    """
+    Load the sentence encoder for the configured backend. Non-default backends
+    are checked against fp32 on PARITY_SAMPLES at load and, if any embedding
+    falls below PARITY_MIN_COSINE, we fall back to fp32. Returns (model, backend).
+    """
+    if backend == "torch":
+        return _build(model_name, "torch"), "torch"
+    try:
+        model = _build(model_name, backend)
+    except ImportError as e:
+        print(f"⚠️ Encoder backend {backend} unavailable ({e}); using torch fp32")
+        return _build(model_name, "torch"), "torch"
+    if EMBED_PARITY_CHECK:
+        reference = _build(model_name, "torch")
+        p = parity(model, reference, PARITY_SAMPLES)
+        if p["min_cosine"] < PARITY_MIN_COSINE:
+            print(f"⚠️ Encoder backend {backend} failed parity {p}; using torch fp32")
+            return reference, "torch"
+        print(f"✅ Encoder backend {backend} parity {p}")
+    return model, backend
@@ -1,7 +1,15 @@
-import pdfplumber
+import hashlib
+import io
+import json
 import subprocess
 import tempfile
+import time
 import os
+from typing import Dict, Optional
+
+from store.cache import KVCache, CACHE_DIR
+from nlp.extractors import DEFAULT_BACKEND, EXTRACT_FALLBACK, assess_text
+from nlp.page_worker import IsolatedPageExtractor, PAGE_TIMEOUT_S
 
 # Try importing OCR libs; if unavailable, set flag
 try:
@@ -11,27 +19,103 @@ try:
 except ImportError:
     OCR_AVAILABLE = False
 
+# Backend tried for pages the primary backend renders as table/column soup
+LAYOUT_BACKEND = "pdfplumber"
+
+# OCR results keyed by a hash of the rendered page image
+OCR_LANG = os.environ.get("OCR_LANG", "eng")
+OCR_CACHE = KVCache(CACHE_DIR / "ocr.db", max_bytes=int(os.environ.get("OCR_CACHE_MB", "256")) * 1024 * 1024)
+
+def iter_pages(pdf_path: str, backend: str = DEFAULT_BACKEND, fallback: bool = EXTRACT_FALLBACK,
+               reuse: Optional[Dict[str, str]] = None):
+    """
+    Yield {'page_num', 'text', 'source', 'ocr_saved_s', 'fp', 'reason'} for
+    every page. The primary backend reads each page; when fallback is on,
+    pages whose text looks like a scan go to OCR and layout-heavy pages are
+    re-read with LAYOUT_BACKEND. A page no extractor got any text from has
+    source 'skipped' and the why in 'reason' (None otherwise). With `reuse`
+    (page fingerprint -> text from an earlier version of the document)
+    pages whose raw content is unchanged are not extracted again. Parsed
+    page objects live (and are closed) in the extraction worker, so memory
+    stays flat regardless of page count.
+    """
+    with IsolatedPageExtractor(pdf_path, backend=backend) as extractor:
+        for i in range(extractor.page_count):
+            # always fingerprinted so this version can serve as a base for the next one
+            fp = extractor.fingerprint(i)
+            if reuse is not None and fp is not None and fp in reuse:
+                yield {"page_num": i + 1, "text": reuse[fp], "source": "reused", "ocr_saved_s": 0.0, "fp": fp,
+                       "reason": None}
+                continue
+            res = extractor.extract(i)
+            text, source, ocr_saved_s = res["text"], backend, 0.0
+            reason = f"{backend} {res['status']}" if res["status"] != "ok" else "no text"
+            quality = assess_text(text) if res["status"] == "ok" else "image"
+            if fallback and quality == "layout" and backend != LAYOUT_BACKEND:
+                alt = extractor.extract(i, backend=LAYOUT_BACKEND)
+                if alt["status"] == "ok" and assess_text(alt["text"]) != "image":
+                    text, source = alt["text"], LAYOUT_BACKEND
+            elif quality == "image" and (fallback or res["status"] != "ok"):
+                ocr = ocr_page_safe(pdf_path, i)
+                if ocr["text"]:
+                    text, source = ocr["text"], "ocr_cache" if ocr["cached"] else "ocr"
+                    ocr_saved_s = ocr["saved_s"]
+                else:
+                    reason += "; OCR found no text" if OCR_AVAILABLE else "; OCR unavailable"
+            if text.strip():
+                reason = None
+            else:
+                source = "skipped"
+            yield {"page_num": i + 1, "text": text, "source": source, "ocr_saved_s": ocr_saved_s, "fp": fp,
+                   "reason": reason}
+
+def iter_text_from_pdf(pdf_path: str):
+    for page in iter_pages(pdf_path):
+        yield page["text"].strip()
+
 def extract_text_from_pdf(pdf_path: str):
-    pages_text = []
-    with pdfplumber.open(pdf_path) as pdf:
-        for i, page in enumerate(pdf.pages):
-            text = (page.extract_text() or "").strip()
-            # Only OCR if library is available and page has too little text
-            if len(text) < 50 and OCR_AVAILABLE:
-                text = ocr_page(pdf_path, i)
-            pages_text.append(text)
-    return pages_text
-
-def ocr_page(pdf_path: str, page_index: int) -> str:
-    if not OCR_AVAILABLE:
-        return ""
+    return list(iter_text_from_pdf(pdf_path))
+
+def _render_page(pdf_path: str, page_index: int, timeout: float) -> bytes:
     with tempfile.TemporaryDirectory() as td:
         img_prefix = os.path.join(td, "page")
         subprocess.run(
-            ["pdftoppm", pdf_path, img_prefix, "-png",
+            ["pdftoppm", pdf_path, img_prefix, "-png", "-singlefile",
              "-f", str(page_index+1), "-l", str(page_index+1)],
-            check=True
+            check=True, timeout=timeout
         )
-        img_path = img_prefix + "-1.png"
-        image = Image.open(img_path)
-        return pytesseract.image_to_string(image).strip()
+        with open(img_prefix + ".png", "rb") as f:
+            return f.read()
+
+def ocr_page_cached(pdf_path: str, page_index: int, timeout: float = PAGE_TIMEOUT_S) -> dict:
+    """
+    OCR one page, reusing earlier results for pixel-identical pages.
+    Returns {'text', 'cached', 'saved_s'}; saved_s is the tesseract time a
+    cache hit avoided (as measured when the entry was first computed).
+    """
+    if not OCR_AVAILABLE:
+        return {"text": "", "cached": False, "saved_s": 0.0}
+    png = _render_page(pdf_path, page_index, timeout)
+    key = hashlib.sha256(png).hexdigest() + ":" + OCR_LANG
+    hit = OCR_CACHE.get(key)
+    if hit is not None:
+        entry = json.loads(hit)
+        return {"text": entry["text"], "cached": True, "saved_s": entry["seconds"]}
+
+    t0 = time.perf_counter()
+    image = Image.open(io.BytesIO(png))
+    text = pytesseract.image_to_string(image, lang=OCR_LANG, timeout=timeout).strip()
+    seconds = time.perf_counter() - t0
+    OCR_CACHE.put(key, json.dumps({"text": text, "seconds": round(seconds, 3)}).encode("utf-8"))
+    return {"text": text, "cached": False, "saved_s": 0.0}
+
+def ocr_page(pdf_path: str, page_index: int, timeout: float = PAGE_TIMEOUT_S) -> str:
+    return ocr_page_cached(pdf_path, page_index, timeout)["text"]
+
+def ocr_page_safe(pdf_path: str, page_index: int) -> dict:
+    """OCR fallback that never raises; a page it cannot read is skipped ('')."""
+    try:
+        return ocr_page_cached(pdf_path, page_index)
+    except (subprocess.SubprocessError, RuntimeError, OSError) as e:
+        print(f"⚠️ OCR skipped page {page_index + 1}: {e}")
+        return {"text": "", "cached": False, "saved_s": 0.0}
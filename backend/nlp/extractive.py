@@ -0,0 +1,62 @@
+import os
+from typing import Callable, List, Sequence
+
+import numpy as np
+
+# Relevance vs novelty trade-off of maximal marginal relevance
+MMR_LAMBDA = 0.7
+# Sentences shorter than this (headers, table debris) are never selected
+MIN_SENTENCE_WORDS = 5
+# Tokens of extractively pre-selected sentences passed on to the summarizer
+# per document/section (0 = summarize everything)
+EXTRACT_TOKENS = int(os.environ.get("SUMMARY_EXTRACT_TOKENS", "2000"))
+
+
+def centrality(vecs: np.ndarray) -> np.ndarray:
+    """Cosine of each (L2-normalized) sentence vector to the section centroid."""
+    centroid = vecs.mean(axis=0)
+    norm = np.linalg.norm(centroid)
+    return vecs @ (centroid / norm) if norm > 0 else np.zeros(len(vecs), dtype=vecs.dtype)
+
+
+def select_sentences(sentences: Sequence[str], vecs: np.ndarray, lengths: Sequence[int], budget: int,
+                     lam: float = MMR_LAMBDA) -> List[int]:
+    """
+    Indices (in document order) of the sentences to keep, up to `budget`
+    tokens. Sentences are picked by maximal marginal relevance: centrality
+    to the whole section, penalized by similarity to what is already
+    picked, so the extract covers the section's main themes without
+    repeating itself. Runs in O(picked * n) on the sentence vectors.
+    """
+    n = len(sentences)
+    if sum(lengths) <= budget:
+        return list(range(n))
+    rel = centrality(vecs)
+    ok = np.array([len(s.split()) >= MIN_SENTENCE_WORDS for s in sentences])
+    lengths = np.asarray(lengths)
+    redundancy = np.zeros(n, dtype=np.float32)
+    picked, used = [], 0
+    while True:
+        fits = ok & (lengths <= budget - used)
+        if not fits.any():
+            break
+        score = np.where(fits, lam * rel - (1 - lam) * redundancy, -np.inf)
+        i = int(np.argmax(score))
+        picked.append(i)
+        used += int(lengths[i])
+        ok[i] = False
+        redundancy = np.maximum(redundancy, vecs @ vecs[i])
+    return sorted(picked)
+
+
+def preselect(sentences: List[str], lengths: Sequence[int], encode: Callable[[List[str]], np.ndarray],
+              budget: int = EXTRACT_TOKENS) -> List[str]:
+    """
+    The most central, mutually non-redundant sentences, in document order,
+    up to `budget` summarizer tokens. `encode` returns L2-normalized
+    sentence vectors and is only called when the text is over budget.
+    """
+    if budget <= 0 or sum(lengths) <= budget:
+        return list(sentences)
+    keep = select_sentences(sentences, encode(list(sentences)), lengths, budget)
+    return [sentences[i] for i in keep] if keep else list(sentences)
@@ -0,0 +1,193 @@
+import hashlib
+import os
+import re
+
+# Backend used for the first pass over every page; others are per-page fallbacks
+DEFAULT_BACKEND = os.environ.get("EXTRACT_BACKEND", "pymupdf")
+EXTRACT_FALLBACK = os.environ.get("EXTRACT_FALLBACK", "1") != "0"
+
+# Text-quality heuristics (see assess_text)
+MIN_TEXT_CHARS = 50
+MIN_ALPHA_RATIO = 0.4
+LAYOUT_MIN_LINES = 20
+LAYOUT_MAX_AVG_LINE = 25
+
+_CID = re.compile(r"\(cid:\d+\)")
+
+
+class PageExtractor:
+    """Per-page text extraction backend. Subclasses register in EXTRACTORS."""
+    name = ""
+
+    def __init__(self, pdf_path: str):
+        self.pdf_path = pdf_path
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def page_text(self, page_index: int) -> str:
+        raise NotImplementedError
+
+    def page_fingerprint(self, page_index: int) -> str:
+        """
+        Hash of the page's raw content, computed without text extraction:
+        geometry, content streams and the resources they draw with (Form
+        XObject streams, image bytes, fonts), by resource name and content,
+        never by object number, so it matches across separate PDF files.
+        """
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class PyMuPDFExtractor(PageExtractor):
+    """Fast plain-text extraction via MuPDF."""
+    name = "pymupdf"
+
+    def __init__(self, pdf_path: str):
+        import fitz
+        super().__init__(pdf_path)
+        self._fitz = fitz
+        self.doc = fitz.open(pdf_path)
+        self._digests = {}  # xref -> content digest; resources are shared across pages
+
+    def __len__(self):
+        return len(self.doc)
+
+    def page_text(self, page_index: int) -> str:
+        page = self.doc[page_index]
+        try:
+            return page.get_text("text")
+        finally:
+            del page
+            # drop MuPDF's cached fonts/images/display lists for this page
+            self._fitz.TOOLS.store_shrink(100)
+
+    def _stream_digest(self, xref: int) -> bytes:
+        if xref not in self._digests:
+            self._digests[xref] = hashlib.sha256(self.doc.xref_stream_raw(xref) or b"").digest()
+        return self._digests[xref]
+
+    def _font_digest(self, xref: int) -> bytes:
+        if xref not in self._digests:
+            # the embedded font program if any; the name/type/encoding always
+            basename, ext, ftype, buffer = self.doc.extract_font(xref)
+            h = hashlib.sha256(repr((basename, ext, ftype)).encode())
+            h.update(buffer or b"")
+            self._digests[xref] = h.digest()
+        return self._digests[xref]
+
+    def page_fingerprint(self, page_index: int) -> str:
+        page = self.doc[page_index]
+        h = hashlib.sha256(repr(tuple(page.rect)).encode())
+        h.update(page.read_contents())
+        # (xref, name, invoker, bbox): Form XObjects, including nested ones
+        for xref, name, _, bbox in sorted(page.get_xobjects(), key=lambda x: x[1]):
+            h.update(f"form:{name}:{tuple(bbox)}".encode())
+            h.update(self._stream_digest(xref))
+        # (xref, smask, w, h, bpc, cs, alt-cs, name, filter, referencer)
+        for img in sorted(page.get_images(full=True), key=lambda x: x[7]):
+            h.update(f"image:{img[7]}".encode())
+            h.update(self._stream_digest(img[0]))
+        # (xref, ext, type, basefont, name, encoding, referencer)
+        for font in sorted(page.get_fonts(full=True), key=lambda x: x[4]):
+            h.update(f"font:{font[4]}:{font[5]}".encode())
+            h.update(self._font_digest(font[0]))
+        return h.hexdigest()
+
+    def close(self):
+        self.doc.close()
+
+
+class PdfPlumberExtractor(PageExtractor):
+    """Slower, layout-aware extraction; better for tables and multi-column pages."""
+    name = "pdfplumber"
+
+    def __init__(self, pdf_path: str):
+        import pdfplumber
+        super().__init__(pdf_path)
+        self.pdf = pdfplumber.open(pdf_path)
+
+    def __len__(self):
+        return len(self.pdf.pages)
+
+    def page_text(self, page_index: int) -> str:
+        page = self.pdf.pages[page_index]
+        try:
+            return page.extract_text() or ""
+        finally:
+            page.close()
+
+    def _hash_resources(self, h, resources, seen: set):
+        """Feed Form XObjects (recursively), images and fonts of `resources` into `h`."""
+        from pdfminer.pdftypes import PDFStream, resolve1
+
+        resources = resolve1(resources) or {}
+        xobjects = resolve1(resources.get("XObject")) or {}
+        for name in sorted(xobjects):
+            ref = xobjects[name]
+            obj = resolve1(ref)
+            if not isinstance(obj, PDFStream):
+                continue
+            subtype = getattr(resolve1(obj.get("Subtype")), "name", "")
+            h.update(f"{subtype}:{name}".encode())
+            h.update(hashlib.sha256(obj.get_rawdata() or b"").digest())
+            key = getattr(ref, "objid", id(obj))
+            if subtype == "Form" and key not in seen:
+                seen.add(key)
+                self._hash_resources(h, obj.get("Resources"), seen)
+        fonts = resolve1(resources.get("Font")) or {}
+        for name in sorted(fonts):
+            font = resolve1(fonts[name]) or {}
+            h.update(f"font:{name}:{resolve1(font.get('BaseFont'))}:{resolve1(font.get('Subtype'))}".encode())
+            h.update(repr(resolve1(font.get("Encoding"))).encode())
+            desc = resolve1(font.get("FontDescriptor")) or {}
+            for key in ("FontFile", "FontFile2", "FontFile3"):
+                program = resolve1(desc.get(key))
+                if isinstance(program, PDFStream):
+                    h.update(hashlib.sha256(program.get_rawdata() or b"").digest())
+
+    def page_fingerprint(self, page_index: int) -> str:
+        from pdfminer.pdftypes import resolve1
+        page = self.pdf.pages[page_index]
+        h = hashlib.sha256(repr(tuple(page.bbox)).encode())
+        for stream in page.page_obj.contents:
+            h.update(resolve1(stream).get_data())
+        self._hash_resources(h, page.page_obj.resources, set())
+        return h.hexdigest()
+
+    def close(self):
+        self.pdf.close()
+
+
+EXTRACTORS = {cls.name: cls for cls in (PyMuPDFExtractor, PdfPlumberExtractor)}
+
+
+def open_extractor(name: str, pdf_path: str) -> PageExtractor:
+    if name not in EXTRACTORS:
+        raise ValueError(f"Unknown extraction backend: {name}")
+    return EXTRACTORS[name](pdf_path)
+
+
+def assess_text(text: str) -> str:
+    """
+    Classify extracted page text:
+      'image'  - (almost) no text layer or garbled glyphs -> OCR
+      'layout' - many very short lines, typical of tables/columns -> layout-aware backend
+      'ok'     - keep as is
+    """
+    stripped = text.strip()
+    if len(stripped) < MIN_TEXT_CHARS:
+        return "image"
+    if _CID.search(stripped):
+        return "image"
+    visible = [c for c in stripped if not c.isspace()]
+    alpha = sum(c.isalnum() for c in visible)
+    if alpha / max(len(visible), 1) < MIN_ALPHA_RATIO:
+        return "image"
+    lines = [ln for ln in stripped.splitlines() if ln.strip()]
+    avg_line = sum(len(ln) for ln in lines) / len(lines)
+    if len(lines) >= LAYOUT_MIN_LINES and avg_line < LAYOUT_MAX_AVG_LINE:
+        return "layout"
+    return "ok"
@@ -0,0 +1,165 @@
+import multiprocessing as mp
+import os
+import time
+from typing import Any, Dict, Optional
+
+from nlp.extractors import DEFAULT_BACKEND, open_extractor
+
+try:
+    import resource  # POSIX only
+except ImportError:
+    resource = None
+
+# Per-page limits for the isolated extraction worker
+PAGE_TIMEOUT_S = float(os.environ.get("PAGE_TIMEOUT_S", "30"))
+PAGE_MAX_MEMORY_MB = int(os.environ.get("PAGE_MAX_MEMORY_MB", "1536"))
+SLOW_PAGE_S = float(os.environ.get("SLOW_PAGE_S", "5"))
+# Restart the worker after this many pages so parser caches/fragmentation can't accumulate
+PAGE_WORKER_RECYCLE = int(os.environ.get("PAGE_WORKER_RECYCLE", "200"))
+
+# spawn, not fork: the parent may hold GBs of model weights, which would count
+# against the child's address-space limit and be copied on write.
+_CTX = mp.get_context("spawn")
+
+
+def _serve(conn, pdf_path: str, backend: str, max_memory_mb: int):
+    """Worker loop: receive (op, page index, backend), reply with page text or fingerprint."""
+    if resource is not None and max_memory_mb > 0:
+        limit = max_memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    try:
+        # the primary backend is opened up front; fallbacks only when first asked for
+        opened = {backend: open_extractor(backend, pdf_path)}
+    except Exception as e:
+        conn.send(("error", repr(e)))
+        return
+    conn.send(("ready", len(opened[backend])))
+    while True:
+        try:
+            msg = conn.recv()
+        except EOFError:
+            break
+        if msg is None:
+            break
+        op, page_index, name = msg
+        try:
+            if name not in opened:
+                opened[name] = open_extractor(name, pdf_path)
+            ex = opened[name]
+            conn.send(("ok", ex.page_fingerprint(page_index) if op == "fingerprint" else ex.page_text(page_index)))
+        except MemoryError:
+            conn.send(("oom", ""))
+        except Exception as e:
+            conn.send(("error", repr(e)))
+    for ex in opened.values():
+        ex.close()
+
+
+class IsolatedPageExtractor:
+    """
+    Extracts one page at a time in a child process with a wall-clock and
+    memory limit, so a single pathological page cannot stall or OOM the job.
+    The worker is killed and restarted whenever a page times out or crashes.
+    """
+
+    def __init__(self, pdf_path, backend: str = DEFAULT_BACKEND,
+                 timeout_s: float = PAGE_TIMEOUT_S, max_memory_mb: int = PAGE_MAX_MEMORY_MB):
+        self.pdf_path = str(pdf_path)
+        self.backend = backend
+        self.timeout_s = timeout_s
+        self.max_memory_mb = max_memory_mb
+        self.page_count = 0
+        self._served = 0
+        self._proc = None
+        self._conn = None
+        self._start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _start(self):
+        parent, child = _CTX.Pipe()
+        self._proc = _CTX.Process(
+            target=_serve, args=(child, self.pdf_path, self.backend, self.max_memory_mb), daemon=True
+        )
+        self._proc.start()
+        child.close()
+        self._conn = parent
+        # opening the document gets the same time budget as a page
+        if not parent.poll(self.timeout_s):
+            self._kill()
+            raise RuntimeError(f"Timed out opening {self.pdf_path}")
+        try:
+            kind, payload = parent.recv()
+        except EOFError:
+            self._kill()
+            raise RuntimeError(f"Extraction worker died opening {self.pdf_path}")
+        if kind != "ready":
+            self._kill()
+            raise RuntimeError(f"Could not open {self.pdf_path}: {payload}")
+        self.page_count = payload
+        self._served = 0
+
+    def _kill(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+        if self._proc is not None:
+            if self._proc.is_alive():
+                self._proc.kill()
+            self._proc.join()
+            self._proc = None
+
+    def extract(self, page_index: int, backend: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Extract one page with `backend` (default: the extractor's primary one).
+        Returns {'text', 'status', 'elapsed'} where status is one of
+        'ok', 'timeout', 'oom', 'crashed' or 'error'.
+        """
+        return self._call("text", page_index, backend or self.backend)
+
+    def fingerprint(self, page_index: int) -> Optional[str]:
+        """Content hash of a page (None if the worker could not compute it)."""
+        res = self._call("fingerprint", page_index, self.backend)
+        return res["text"] or None
+
+    def _call(self, op: str, page_index: int, backend: str) -> Dict[str, Any]:
+        if self._proc is not None and self._served >= PAGE_WORKER_RECYCLE:
+            self.close()
+        if self._proc is None:
+            self._start()
+        self._served += 1
+        t0 = time.perf_counter()
+        status, text = "ok", ""
+        try:
+            self._conn.send((op, page_index, backend))
+            if self._conn.poll(self.timeout_s):
+                status, text = self._conn.recv()
+            else:
+                status = "timeout"
+        except (EOFError, BrokenPipeError, ConnectionResetError):
+            status = "crashed"
+        elapsed = time.perf_counter() - t0
+
+        if status in ("timeout", "crashed", "oom"):
+            # the worker is stuck, dead or fragmented: start fresh for the next page
+            self._kill()
+        if status != "ok":
+            print(f"⚠️ Page {page_index + 1} {op} {status} after {elapsed:.1f}s ({backend}): {text}")
+            text = ""
+        elif elapsed >= SLOW_PAGE_S:
+            print(f"🐢 Slow page {page_index + 1}: {elapsed:.1f}s ({backend})")
+        return {"text": text, "status": status, "elapsed": elapsed}
+
+    def close(self):
+        if self._conn is not None:
+            try:
+                self._conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+            if self._proc is not None:
+                self._proc.join(timeout=1)
+        self._kill()
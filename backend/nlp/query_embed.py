@@ -0,0 +1,147 @@
+import os
+import queue
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Dict
+
+import numpy as np
+
+# Micro-batching of concurrent query encodes
+QUERY_BATCH_MAX = int(os.environ.get("QUERY_BATCH_MAX", "32"))
+QUERY_BATCH_WAIT_MS = float(os.environ.get("QUERY_BATCH_WAIT_MS", "3"))
+# Recently asked questions' vectors, per model
+QUERY_CACHE_SIZE = int(os.environ.get("QUERY_CACHE_SIZE", "2048"))
+
+
+class QueryBatcher:
+    """
+    Funnels single-query encodes from concurrent request threads into one
+    model.encode call. A lone request is encoded immediately; when others
+    are already queued (i.e. under load) the worker waits up to max_wait_ms
+    for more, up to max_batch_size queries per forward pass.
+    """
+
+    def __init__(self, model, max_batch_size: int = QUERY_BATCH_MAX, max_wait_ms: float = QUERY_BATCH_WAIT_MS):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait_s = max_wait_ms / 1000
+        self._queue: "queue.Queue[tuple[str, Future]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def encode(self, text: str) -> np.ndarray:
+        """L2-normalized float32 vector of shape (1, dim)."""
+        fut: Future = Future()
+        self._queue.put((text, fut))
+        return fut.result()
+
+    def _collect(self) -> list:
+        batch = [self._queue.get()]
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if len(batch) == 1 or self.max_wait_s <= 0:
+            return batch
+        # more than one was waiting: we are under load, gather a little longer
+        deadline = time.perf_counter() + self.max_wait_s
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            texts = [t for t, _ in batch]
+            try:
+                vecs = self.model.encode(texts, batch_size=len(texts), convert_to_numpy=True,
+                                         normalize_embeddings=True, show_progress_bar=False)
+            except Exception as e:
+                for _, fut in batch:
+                    fut.set_exception(e)
+                continue
+            for i, (_, fut) in enumerate(batch):
+                fut.set_result(vecs[i:i + 1].astype("float32"))
+
+
+_BATCHERS: Dict[str, QueryBatcher] = {}
+_LOCK = threading.Lock()
+
+
+def get_batcher(model_name: str, model) -> QueryBatcher:
+    with _LOCK:
+        if model_name not in _BATCHERS:
+            _BATCHERS[model_name] = QueryBatcher(model)
+        return _BATCHERS[model_name]
+
+
+class QueryCache:
+    """Thread-safe LRU of query vectors keyed by (model name, normalized query)."""
+
+    def __init__(self, max_size: int = QUERY_CACHE_SIZE):
+        self.max_size = max_size
+        self._data: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple):
+        with self._lock:
+            vec = self._data.get(key)
+            if vec is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return vec
+
+    def put(self, key: tuple, vec: np.ndarray):
+        with self._lock:
+            self._data[key] = vec
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "size": len(self._data),
+            }
+
+
+QUERY_CACHE = QueryCache()
+_WS = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """Case, spacing and trailing punctuation don't change what is being asked (MiniLM is uncased)."""
+    return _WS.sub(" ", query).strip().rstrip("?.! ").lower()
+
+
+def encode_query(model, model_name: str, query: str) -> np.ndarray:
+    """
+    Embed one retrieval query (shape (1, dim), L2-normalized). Repeated
+    questions are served from QUERY_CACHE; the rest go through the shared
+    batcher.
+    """
+    norm = normalize_query(query) or query
+    key = (model_name, norm)
+    vec = QUERY_CACHE.get(key)
+    if vec is None:
+        vec = get_batcher(model_name, model).encode(norm)
+        QUERY_CACHE.put(key, vec)
+    return vec.copy()  # callers may normalize/modify in place
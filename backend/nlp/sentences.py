@@ -0,0 +1,114 @@
+import json
+import re
+from pathlib import Path
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+CORPUS_DIR = Path("data/corpus")
+
+# A period after these does not end a sentence ("Rs. 10", "XYZ Pvt. Ltd. is", "No. 5")
+ABBREVIATIONS = {
+    "rs", "re", "ltd", "pvt", "co", "inc", "corp", "llp", "no", "nos", "mr", "mrs", "ms", "dr",
+    "sr", "jr", "st", "vs", "viz", "cf", "fig", "sec", "cl", "art", "reg", "govt", "dept",
+    "approx", "e.g", "i.e", "u.s", "a.m", "p.m",
+    # months ("Mar. 31, 2024"); "may" is left out, it ends sentences too often
+    "jan", "feb", "mar", "apr", "jun", "jul", "aug", "sep", "sept", "oct", "nov", "dec",
+}
+
+# sentence-final punctuation (+ closing quotes/brackets) and whitespace, not
+# followed by a lowercase letter; or a blank line (headings have no period)
+_BOUNDARY = re.compile(r"[.!?]+[\"'”’)\]]*\s+(?![a-z])|\n\s*\n")
+_LAST_TOKEN = re.compile(r"[\w.]+$")
+# a list number on its own ("1.", "(a)", "iv.") belongs to the sentence after it
+_ENUMERATOR = re.compile(r"\(?(?:\d{1,3}|[a-z]|[ivxl]{1,5})[.)]", re.I)
+
+
+def _is_abbreviation(text: str, dot: int) -> bool:
+    """Whether the '.' at `dot` closes an abbreviation or an initial ("R. Sharma")."""
+    m = _LAST_TOKEN.search(text, max(0, dot - 12), dot)
+    if not m:
+        return False
+    token = m.group().lower().strip(".")
+    return token in ABBREVIATIONS or (len(token) == 1 and token.isalpha())
+
+
+def sentence_spans(text: str) -> List[Tuple[int, int]]:
+    """(start, end) character offsets of the sentences in `text`, whitespace trimmed."""
+    spans = []
+    start = 0
+    for m in _BOUNDARY.finditer(text):
+        if text[m.start()] == "." and _is_abbreviation(text, m.start()):
+            continue
+        end = m.end()
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        if _ENUMERATOR.fullmatch(text[start:end].strip()):
+            continue
+        if end > start:
+            spans.append((start, end))
+        start = m.end()
+    while start < len(text) and text[start].isspace():
+        start += 1
+    end = len(text.rstrip())
+    if end > start:
+        spans.append((start, end))
+    # leading whitespace of each sentence
+    return [(s + len(text[s:e]) - len(text[s:e].lstrip()), e) for s, e in spans]
+
+
+def split_sentences(text: str) -> List[str]:
+    return [text[s:e] for s, e in sentence_spans(text)]
+
+
+def sentences_path(file_id: str) -> Path:
+    """Sentence offsets per corpus section, written next to the corpus at ingest."""
+    return CORPUS_DIR / f"{file_id}.sents.npz"
+
+
+def save_offsets(path: Path, spans_per_section: Sequence[Sequence[Tuple[int, int]]]):
+    """One flat int32 (n, 2) span array plus per-section row pointers."""
+    counts = [len(s) for s in spans_per_section]
+    spans = np.array([sp for s in spans_per_section for sp in s], dtype=np.int32).reshape(-1, 2)
+    ptr = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+    with open(path, "wb") as f:
+        np.savez_compressed(f, spans=spans, ptr=ptr)
+
+
+def load_offsets(path: Path) -> List[np.ndarray]:
+    with np.load(path) as z:
+        spans, ptr = z["spans"], z["ptr"]
+    return [spans[ptr[i]:ptr[i + 1]] for i in range(len(ptr) - 1)]
+
+
+def load_section_sentences(file_id: str) -> List[Tuple[str, List[str]]]:
+    """
+    (section name, sentences) for every corpus section, cut with the offsets
+    stored at ingest. Files ingested before offsets existed are segmented
+    on the fly.
+    """
+    corpus = CORPUS_DIR / f"{file_id}.jsonl"
+    if not corpus.exists():
+        raise FileNotFoundError(f"No parsed corpus found for {file_id}")
+    with open(corpus, "r", encoding="utf-8") as f:
+        docs = [json.loads(line) for line in f if line.strip()]
+    path = sentences_path(file_id)
+    offsets = load_offsets(path) if path.exists() else None
+    if offsets is not None and len(offsets) != len(docs):
+        print(f"⚠️ Stale sentence offsets for {file_id}; re-segmenting")
+        offsets = None
+    out = []
+    for i, d in enumerate(docs):
+        spans = offsets[i] if offsets is not None else sentence_spans(d["text"])
+        out.append((d["section"], [d["text"][s:e] for s, e in spans]))
+    return out
+
+
+def load_risk_sentences(file_id: str) -> List[str]:
+    """Sentences of the 'Risk Factors' section(s), from the offsets stored at ingest."""
+    return [
+        sent
+        for section, sents in load_section_sentences(file_id)
+        if section.lower().startswith("risk")
+        for sent in sents
+    ]
@@ -1,17 +1,227 @@
+import hashlib
+import os
 from transformers import pipeline
-from typing import List
+from typing import Callable, List, Tuple
+
+from nlp.batching import length_batches, token_lengths
+from nlp.embed_cache import SENTENCE_CACHE, encode_cached, normalize_text
+from nlp.extractive import EXTRACT_TOKENS, preselect
+from nlp.sentences import split_sentences
+from store.cache import KVCache, CACHE_DIR
+
+# BART-family encoders truncate at 1024 tokens
+MAX_INPUT_TOKENS = 1024
+# Padded input tokens per summarizer batch
+SUMMARY_MAX_TOKENS = 8192
+# Map-reduce window size: BART's limit less room for special tokens
+WINDOW_TOKENS = MAX_INPUT_TOKENS - 24
+
+# Summaries by (model, effective generation caps, normalized input hash)
+SUMMARY_CACHE = KVCache(
+    CACHE_DIR / "summaries.db", max_bytes=int(os.environ.get("SUMMARY_CACHE_MB", "64")) * 1024 * 1024
+)
+
+
+def summary_key(model_name: str, text: str, max_len: int, min_len: int) -> str:
+    digest = hashlib.sha1(normalize_text(text).encode("utf-8")).hexdigest()
+    return f"{model_name}:{max_len}:{min_len}:{digest}"
+
+
+def section_key(model_name: str, sentences: List[str], *params) -> str:
+    """Key of a whole section's final summary: model, pipeline parameters and normalized text."""
+    h = hashlib.sha1()
+    for sent in sentences:
+        h.update(normalize_text(sent).encode("utf-8") + b"\n")
+    return "section:" + ":".join(map(str, (model_name, *params))) + ":" + h.hexdigest()
+
+
+def summarize_cached(texts: List[str], caps: List[Tuple[int, int]],
+                     summarize: Callable[[List[str], List[Tuple[int, int]]], List[str]], model_name: str,
+                     force: bool = False) -> List[str]:
+    """
+    Summaries of `texts` from SUMMARY_CACHE, keyed by the (max_length,
+    min_length) each one is actually generated with; `summarize(texts,
+    caps)` runs (once) on the misses, or on everything when `force`.
+    Failed summaries are not stored.
+    """
+    keys = [summary_key(model_name, t, *c) for t, c in zip(texts, caps)]
+    found = {} if force else SUMMARY_CACHE.get_many(list(set(keys)))
+    todo = {}  # key -> first position
+    for i, k in enumerate(keys):
+        if k not in found:
+            todo.setdefault(k, i)
+    if todo:
+        fresh = summarize([texts[i] for i in todo.values()], [caps[i] for i in todo.values()])
+        SUMMARY_CACHE.put_many({k: s.encode("utf-8") for k, s in zip(todo, fresh) if not s.startswith("⚠️")})
+        found.update({k: s.encode("utf-8") for k, s in zip(todo, fresh)})
+    return [found[k].decode("utf-8") for k in keys]
+
+
+# Generation caps are rounded up to this step so inputs of similar length share one
+CAP_STEP = 32
+
+
+def generation_caps(input_tokens: int, max_len: int, min_len: int) -> Tuple[int, int]:
+    """
+    (max_length, min_length) for an input of `input_tokens`: a summary is
+    capped at about half its input (rounded up to CAP_STEP), so short
+    inputs stop decoding early instead of being stretched to the length
+    meant for long ones. Depends on the input alone.
+    """
+    half = -(-input_tokens // 2 // CAP_STEP) * CAP_STEP
+    cap = max(CAP_STEP, min(max_len, half))
+    return cap, min(min_len, cap // 2)
+
+
+def cap_batches(caps: List[Tuple[int, int]], lengths: List[int], max_tokens: int = SUMMARY_MAX_TOKENS,
+                max_batch_size: int = 8) -> List[List[int]]:
+    """
+    Length-bucketed batches in which every input has the same generation
+    caps, since the pipeline takes one max_length/min_length per call.
+    """
+    groups: dict = {}
+    for i, c in enumerate(caps):
+        groups.setdefault(c, []).append(i)
+    batches = []
+    for idx in groups.values():
+        for b in length_batches([lengths[i] for i in idx], max_tokens, max_batch_size):
+            batches.append([idx[j] for j in b])
+    return batches
+
+
+def summarize_batched(summarizer, model_name: str, texts: List[str], max_len: int, min_len: int,
+                      batch_size: int = 8, force: bool = False) -> List[str]:
+    """
+    Summarize several texts with a transformers summarization pipeline, in
+    length-bucketed batches of inputs sharing generation caps (see
+    generation_caps), one pipeline call per batch; output follows input
+    order. Served from SUMMARY_CACHE unless `force`. A failing batch is
+    retried input by input, so one bad input does not lose the others.
+    """
+    lengths = token_lengths(texts, summarizer.tokenizer, MAX_INPUT_TOKENS)
+    caps = [generation_caps(n, max_len, min_len) for n in lengths]
+    length_of = dict(zip(texts, lengths))
+
+    def run(todo: List[str], todo_caps: List[Tuple[int, int]]) -> List[str]:
+        results = [""] * len(todo)
+        for batch in cap_batches(todo_caps, [length_of[t] for t in todo], SUMMARY_MAX_TOKENS, batch_size):
+            cap, floor = todo_caps[batch[0]]
+            try:
+                out = summarizer([todo[i] for i in batch], max_length=cap, min_length=floor, do_sample=False,
+                                 truncation=True, batch_size=len(batch))
+                summaries = [o["summary_text"].strip() for o in out]
+            except Exception:
+                summaries = [_summarize_one(summarizer, todo[i], cap, floor) for i in batch]
+            for i, summary in zip(batch, summaries):
+                results[i] = summary
+        return results
+
+    return summarize_cached(texts, caps, run, model_name, force=force)
+
+
+def _summarize_one(summarizer, text: str, max_len: int, min_len: int) -> str:
+    try:
+        return summarizer(text, max_length=max_len, min_length=min_len, do_sample=False,
+                          truncation=True)[0]["summary_text"].strip()
+    except Exception as e:
+        return f"⚠️ Summarization failed: {e}"
+
+
+def pack_windows(units: List[str], lengths: List[int], budget: int = WINDOW_TOKENS) -> List[str]:
+    """
+    Greedily join consecutive units (sentences, chunks, partial summaries)
+    into windows of at most `budget` tokens; an oversize unit is a window
+    of its own (and is truncated by the model).
+    """
+    windows, cur, used = [], [], 0
+    for u, n in zip(units, lengths):
+        if cur and used + n > budget:
+            windows.append(" ".join(cur))
+            cur, used = [], 0
+        cur.append(u)
+        used += n
+    if cur:
+        windows.append(" ".join(cur))
+    return windows
+
+
+def map_reduce(docs: List[List[str]], summarize: Callable[[List[str], int], List[str]], tokenizer,
+               map_len: int, final_len: int, budget: int = WINDOW_TOKENS) -> List[str]:
+    """
+    One summary per document, each given as a list of units, covering all
+    of it. Units are packed into token-budgeted windows and the windows of
+    every document are summarized together (`summarize(texts, max_len)`,
+    which batches); each document's partial summaries are then packed and
+    summarized again until it fits a single window, which gets the final
+    `final_len` summary.
+    """
+    level = [[u for u in d if u.strip()] for d in docs]
+    while True:
+        flat = [u for d in level for u in d]
+        lengths = iter(token_lengths(flat, tokenizer))
+        windows = [pack_windows(d, [next(lengths) for _ in d], budget) for d in level]
+        if all(len(w) <= 1 for w in windows):
+            break
+        todo = [(i, w) for i, ws in enumerate(windows) if len(ws) > 1 for w in ws]
+        partial = summarize([w for _, w in todo], map_len)
+        level = [d if len(windows[i]) <= 1 else [] for i, d in enumerate(level)]
+        for (i, _), s in zip(todo, partial):
+            level[i].append(s)
+
+    finals = [ws[0] for ws in windows if ws]
+    out = iter(summarize(finals, final_len)) if finals else iter(())
+    return [next(out) if ws else "" for ws in windows]
+
 
 class HierarchicalSummarizer:
     def __init__(self, model_name: str = "sshleifer/distilbart-cnn-12-6"):
+        self.model_name = model_name
         self.summarizer = pipeline("summarization", model=model_name)
 
-    def summarize_chunk(self, text: str, max_words: int = 120) -> str:
+    def summarize_chunk(self, text: str, max_words: int = 120, force: bool = False) -> str:
+        return self.summarize_many([text], max_words=max_words, force=force)[0]
+
+    def summarize_many(self, texts: List[str], max_words: int = 120, batch_size: int = 8,
+                       force: bool = False) -> List[str]:
+        """
+        Summarize several texts in length-bucketed batches; output follows
+        input order. Served from SUMMARY_CACHE unless `force`.
+        """
         max_len = min(256, max(128, int(max_words * 1.3)))
-        out = self.summarizer(text[:4000], max_length=max_len, min_length=int(max_len * 0.4), do_sample=False)
-        return out[0]["summary_text"]
-
-    def hierarchical_summarize(self, chunks: List[str], target_words: int = 300) -> str:
-        micros = [self.summarize_chunk(c, max_words=120) for c in chunks[:20]]
-        joined = " \n".join(micros)
-        master = self.summarize_chunk(joined, max_words=target_words)
-        return master
+        # callers pass token-budgeted windows; the model truncates the rest
+        return summarize_batched(self.summarizer, self.model_name, list(texts), max_len, int(max_len * 0.4),
+                                 batch_size=batch_size, force=force)
+
+    def document_sentences(self, chunks: List[str]) -> List[str]:
+        """Sentences of the document, with those repeated by chunk overlap dropped."""
+        seen, out = set(), []
+        for chunk in chunks:
+            for s in split_sentences(chunk):
+                if s not in seen:
+                    seen.add(s)
+                    out.append(s)
+        return out
+
+    def hierarchical_summarize(self, chunks: List[str], target_words: int = 300, force: bool = False,
+                               extract_tokens: int = EXTRACT_TOKENS) -> str:
+        """
+        Summarize a whole document from its chunks: every sentence is ranked
+        and the top `extract_tokens` worth kept (see nlp.extractive), then
+        the extract is map-reduced in token-budgeted windows with partial
+        summaries of ~120 words.
+        """
+        from nlp.embeddings import EMBED_MODEL_NAME, _get_model
+
+        sentences = self.document_sentences(chunks)
+        lengths = token_lengths(sentences, self.summarizer.tokenizer)
+
+        def encode(texts: List[str]):
+            model, key = _get_model(EMBED_MODEL_NAME)
+            return encode_cached(model, key, texts, cache=SENTENCE_CACHE)
+
+        extract = preselect(sentences, lengths, encode, extract_tokens)
+
+        def summarize(texts: List[str], max_words: int) -> List[str]:
+            return self.summarize_many(texts, max_words=max_words, force=force)
+
+        return map_reduce([extract], summarize, self.summarizer.tokenizer, map_len=120, final_len=target_words)[0]
@@ -2,3 +2,14 @@ import os
 
 def ensure_dir(path: str) -> None:
     os.makedirs(path, exist_ok=True)
+
+def peak_rss_mb() -> dict:
+    """Peak resident memory (MB) of this process and of its reaped child workers."""
+    try:
+        import resource
+    except ImportError:
+        return {"self": None, "children": None}
+    # ru_maxrss is KB on Linux
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    kids = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    return {"self": round(own, 1), "children": round(kids, 1)}
@@ -0,0 +1,213 @@
+import hashlib
+import re
+import sqlite3
+import threading
+import zlib
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+DB_PATH = Path("data/meta/boilerplate.db")
+DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+
+# MinHash / LSH parameters: 16 bands x 8 rows puts the LSH S-curve's midpoint
+# near Jaccard 0.7; candidates are then verified against SIMILARITY.
+NUM_PERM = 128
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE = 5
+SIMILARITY = 0.8
+MIN_WORDS = 20  # shorter chunks are never treated as boilerplate
+
+_PRIME = np.uint64((1 << 61) - 1)
+_MASK = np.uint64(0xFFFFFFFF)
+_rng = np.random.RandomState(1)  # fixed: signatures are persisted
+_A = _rng.randint(1, 1 << 32, size=NUM_PERM, dtype=np.uint64)
+_B = _rng.randint(0, 1 << 32, size=NUM_PERM, dtype=np.uint64)
+_WORD = re.compile(r"\w+")
+_LOCK = threading.Lock()
+
+
+def get_conn():
+    conn = sqlite3.connect(DB_PATH, timeout=30)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def init_db():
+    with get_conn() as conn:
+        c = conn.cursor()
+        c.execute("""
+        CREATE TABLE IF NOT EXISTS canon(
+            canon_id TEXT PRIMARY KEY,
+            text TEXT,
+            sig BLOB,
+            n_docs INTEGER DEFAULT 0
+        );
+        """)
+        c.execute("""
+        CREATE TABLE IF NOT EXISTS bands(
+            band INTEGER,
+            bucket TEXT,
+            canon_id TEXT
+        );
+        """)
+        c.execute("CREATE INDEX IF NOT EXISTS bands_lookup ON bands(band, bucket)")
+        c.execute("CREATE INDEX IF NOT EXISTS bands_canon ON bands(canon_id)")
+        c.execute("""
+        CREATE TABLE IF NOT EXISTS canon_docs(
+            canon_id TEXT,
+            file_id TEXT,
+            PRIMARY KEY(canon_id, file_id)
+        );
+        """)
+        # registries created before canonical vectors were stored
+        cols = {r["name"] for r in c.execute("PRAGMA table_info(canon)").fetchall()}
+        if "vec" not in cols:
+            c.execute("ALTER TABLE canon ADD COLUMN vec BLOB")
+        # passage text is no longer kept (registries from before that)
+        c.execute("UPDATE canon SET text=NULL WHERE text IS NOT NULL")
+        conn.commit()
+
+
+def minhash(text: str) -> Optional[np.ndarray]:
+    """128-permutation MinHash of the word 5-shingles of `text` (None if too short)."""
+    words = _WORD.findall(text.lower())
+    if len(words) < MIN_WORDS:
+        return None
+    shingles = {" ".join(words[i:i + SHINGLE]) for i in range(len(words) - SHINGLE + 1)}
+    hv = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+    # (a*x + b) mod p, truncated to 32 bits; a, x < 2**32 so a*x fits in uint64
+    perm = ((np.outer(hv, _A) + _B) % _PRIME) & _MASK
+    return perm.min(axis=0).astype(np.uint32)
+
+
+def _buckets(sig: np.ndarray):
+    for b in range(BANDS):
+        yield b, hashlib.sha1(sig[b * ROWS:(b + 1) * ROWS].tobytes()).hexdigest()[:16]
+
+
+def _in_batches(items: list, size: int = 900):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _candidates(c, sigs: list) -> tuple[dict, dict]:
+    """
+    Registered passages sharing an LSH bucket with any of `sigs`: (band,
+    bucket) -> canon ids and canon id -> signature, in a handful of queries.
+    """
+    wanted = {bk for sig in sigs if sig is not None for bk in _buckets(sig)}
+    hits: dict[tuple, list] = {}
+    for batch in _in_batches(sorted({key for _, key in wanted})):
+        q = f"SELECT band, bucket, canon_id FROM bands WHERE bucket IN ({','.join('?' * len(batch))})"
+        for r in c.execute(q, batch):
+            if (r["band"], r["bucket"]) in wanted:
+                hits.setdefault((r["band"], r["bucket"]), []).append(r["canon_id"])
+    known = {}
+    for batch in _in_batches(sorted({cid for ids in hits.values() for cid in ids})):
+        q = f"SELECT canon_id, sig FROM canon WHERE canon_id IN ({','.join('?' * len(batch))})"
+        known.update((r["canon_id"], np.frombuffer(r["sig"], dtype=np.uint32)) for r in c.execute(q, batch))
+    return hits, known
+
+
+def dedupe_chunks(file_id: str, texts: list[str], stats: Optional[dict] = None) -> list[Optional[dict]]:
+    """
+    Register a document's chunks in the corpus-wide LSH index and match each
+    one against near-duplicates seen before (in any document, including
+    earlier chunks of this one). Returns, per chunk, None or
+    {'canon_id', 'shared'} where `shared` is True when other documents carry
+    the same passage (i.e. it is corpus boilerplate). Chunks with the same
+    canon_id are embedded once, see build_faiss_index.
+    """
+    sigs = [minhash(t) for t in texts]
+    with get_conn() as conn:
+        hits, known = _candidates(conn.cursor(), sigs)
+
+    canon_ids: list[Optional[str]] = []
+    new = []  # (canon_id, sig, buckets) of passages first seen in this document
+    near = 0
+    for text, sig in zip(texts, sigs):
+        if sig is None:
+            canon_ids.append(None)
+            continue
+        buckets = list(_buckets(sig))
+        cands = {cid for bk in buckets for cid in hits.get(bk, ())}
+        best, best_sim = None, 0.0
+        for cid in cands:
+            sim = float(np.mean(known[cid] == sig))
+            if sim > best_sim:
+                best, best_sim = cid, sim
+        if best is not None and best_sim >= SIMILARITY:
+            canon_ids.append(best)
+            near += 1
+            continue
+        canon_id = hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+        canon_ids.append(canon_id)
+        if canon_id not in known:
+            known[canon_id] = sig
+            new.append((canon_id, sig, buckets))
+            for bk in buckets:
+                hits.setdefault(bk, []).append(canon_id)
+
+    refs = sorted({cid for cid in canon_ids if cid is not None})
+    with _LOCK, get_conn() as conn:
+        c = conn.cursor()
+        for canon_id, sig, buckets in new:
+            if c.execute("INSERT OR IGNORE INTO canon(canon_id, sig) VALUES(?,?)",
+                         (canon_id, sig.tobytes())).rowcount:
+                c.executemany("INSERT INTO bands(band, bucket, canon_id) VALUES(?,?,?)",
+                              [(b, key, canon_id) for b, key in buckets])
+        for canon_id in refs:
+            if c.execute("INSERT OR IGNORE INTO canon_docs(canon_id, file_id) VALUES(?,?)",
+                         (canon_id, file_id)).rowcount:
+                c.execute("UPDATE canon SET n_docs = n_docs + 1 WHERE canon_id=?", (canon_id,))
+        conn.commit()
+        n_docs = {}
+        for batch in _in_batches(refs):
+            q = f"SELECT canon_id, n_docs FROM canon WHERE canon_id IN ({','.join('?' * len(batch))})"
+            n_docs.update((r["canon_id"], r["n_docs"]) for r in c.execute(q, batch))
+
+    out = [{"canon_id": cid, "shared": n_docs.get(cid, 0) > 1} if cid is not None else None for cid in canon_ids]
+    if stats is not None:
+        stats["boilerplate_chunks"] = sum(1 for m in out if m and m["shared"])
+        stats["near_duplicate_chunks"] = near
+    return out
+
+
+def load_vectors(canon_ids) -> dict:
+    """canon_id -> stored vector of the passage (passages without one are left out)."""
+    ids = sorted(set(canon_ids))
+    out = {}
+    with get_conn() as conn:
+        for batch in _in_batches(ids):
+            q = f"SELECT canon_id, vec FROM canon WHERE vec IS NOT NULL AND canon_id IN ({','.join('?' * len(batch))})"
+            out.update((r["canon_id"], np.frombuffer(r["vec"], dtype=np.float32)) for r in conn.execute(q, batch))
+    return out
+
+
+def store_vectors(vecs: dict):
+    """Keep the vector of each passage the first time it is embedded."""
+    with _LOCK, get_conn() as conn:
+        conn.executemany("UPDATE canon SET vec=? WHERE canon_id=? AND vec IS NULL",
+                         [(np.asarray(v, dtype=np.float32).tobytes(), cid) for cid, v in vecs.items()])
+        conn.commit()
+
+
+def forget_file(file_id: str):
+    """
+    Drop a file's references (e.g. after cancellation) and the passages no
+    indexed document carries any more, so the registry tracks the corpus.
+    """
+    with _LOCK, get_conn() as conn:
+        c = conn.cursor()
+        ids = [r["canon_id"] for r in c.execute("SELECT canon_id FROM canon_docs WHERE file_id=?", (file_id,))]
+        c.execute("DELETE FROM canon_docs WHERE file_id=?", (file_id,))
+        c.executemany("UPDATE canon SET n_docs = n_docs - 1 WHERE canon_id=?", [(i,) for i in ids])
+        c.execute("DELETE FROM bands WHERE canon_id IN (SELECT canon_id FROM canon WHERE n_docs <= 0)")
+        c.execute("DELETE FROM canon WHERE n_docs <= 0")
+        conn.commit()
+
+
+init_db()
@@ -2,12 +2,12 @@ from services.risk import analyze_risk
 from services.summary import generate_summaries
 from fastapi import HTTPException
 
-def compare_ipos(file_id_1: str, file_id_2: str):
-    """Compare two IPO files on risk and summary metrics."""
+def compare_ipos(file_id_1: str, file_id_2: str, risk_mode: str = "accurate"):
+    """Compare two IPO files on risk and summary metrics (risk_mode="fast" for bulk screening)."""
     try:
         # --- Risk Analysis ---
-        risk1 = analyze_risk(file_id_1)
-        risk2 = analyze_risk(file_id_2)
+        risk1 = analyze_risk(file_id_1, mode=risk_mode)
+        risk2 = analyze_risk(file_id_2, mode=risk_mode)
 
         # --- Summaries ---
         sum1 = generate_summaries(file_id_1)
@@ -30,6 +30,7 @@ def compare_ipos(file_id_1: str, file_id_2: str):
                 "top_negatives": risk2["top_negatives"],
             },
             "comparison": {
+                "risk_mode": risk1["mode"] if risk1["mode"] == risk2["mode"] else "mixed",
                 "higher_risk": (
                     file_id_1 if risk1["risk_score"] > risk2["risk_score"] else file_id_2
                 ),
@@ -7,7 +7,8 @@ router = APIRouter()
 class CompareReq(BaseModel):
     file_id_1: str
     file_id_2: str
+    risk_mode: str = "accurate"
 
 @router.post("/compare")
 def compare_endpoint(payload: CompareReq):
-    return compare_ipos(payload.file_id_1, payload.file_id_2)
+    return compare_ipos(payload.file_id_1, payload.file_id_2, payload.risk_mode)
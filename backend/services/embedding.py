@@ -1,15 +1,25 @@
 from pathlib import Path
+import hashlib
 import json
 import numpy as np
-from sentence_transformers import SentenceTransformer
 import faiss
+from typing import Optional
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 
+from nlp.embed_cache import encode_cached
+from nlp.encoder_backends import encoder_key, load_encoder
+from services import boilerplate, jobs
+
 CORPUS_DIR = Path("data/corpus")
 FAISS_DIR = Path("data/faiss")
 FAISS_DIR.mkdir(parents=True, exist_ok=True)
 
-EMBED_MODEL = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+EMBED_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+# fp32 torch by default; EMBED_BACKEND selects torch-int8 / onnx / onnx-int8
+EMBED_MODEL, EMBED_BACKEND = load_encoder(EMBED_MODEL_NAME)
+# cache key for vectors produced by this model + backend
+EMBED_MODEL_KEY = encoder_key(EMBED_MODEL_NAME, EMBED_BACKEND)
+EMBED_BATCH_SIZE = 32
 
 def load_sections(file_id: str):
     """Load the parsed text sections saved earlier in data/corpus."""
@@ -25,6 +35,18 @@ def load_sections(file_id: str):
     return docs
 
 
+def pages_path(file_id: str) -> Path:
+    """Per-page manifest written next to the section corpus at ingest."""
+    return CORPUS_DIR / f"{file_id}.pages.jsonl"
+
+
+def load_pages(file_id: str):
+    """Yield the page records ({page_num, section, fp, text}) of an ingested file."""
+    with open(pages_path(file_id), "r", encoding="utf-8") as f:
+        for line in f:
+            yield json.loads(line)
+
+
 def chunk_text(docs: list[dict], chunk_size=1200, chunk_overlap=150):
     """Split text into overlapping chunks."""
     splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
@@ -40,14 +62,158 @@ def chunk_text(docs: list[dict], chunk_size=1200, chunk_overlap=150):
     return chunks
 
 
-def build_faiss_index(file_id: str):
-    """Generate embeddings and save FAISS index."""
-    docs = load_sections(file_id)
-    chunks = chunk_text(docs)
+def chunk_pages(pages, chunk_size=1200, chunk_overlap=150):
+    """
+    Split page by page, so an edit on one page cannot shift chunk boundaries
+    on the others (which is what lets a revised document reuse vectors).
+    """
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    chunks = []
+    counters: dict[str, int] = {}
+    for p in pages:
+        for chunk in splitter.split_text(p["text"]):
+            i = counters.get(p["section"], 0)
+            counters[p["section"]] = i + 1
+            chunks.append({
+                "section": p["section"],
+                "chunk_id": f"{p['section']}_{i}",
+                "page": p["page_num"],
+                "text": chunk
+            })
+    return chunks
+
+
+def _text_key(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def load_index(file_id: str):
+    """(FAISS index, chunk metadata) of an indexed file."""
+    index_path = FAISS_DIR / f"{file_id}.index"
+    meta_path = FAISS_DIR / f"{file_id}_meta.json"
+    if not index_path.exists() or not meta_path.exists():
+        raise FileNotFoundError(f"No FAISS index or metadata found for {file_id}")
+    index = faiss.read_index(str(index_path))
+    with open(meta_path, "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    return index, meta
+
+
+def _row(chunk: dict, i: int):
+    """Index row of a chunk: its own row, None for shared boilerplate, position in older files."""
+    return None if "ref" in chunk else chunk.get("row", i)
+
+
+def load_chunk_vectors(file_id: str):
+    """
+    (chunk metadata, one vector per chunk) for an indexed file. Shared
+    boilerplate chunks are not in the file's index; their vector is the one
+    stored once in the boilerplate registry.
+    """
+    index, meta = load_index(file_id)
+    own = index.reconstruct_n(0, index.ntotal) if index.ntotal else np.zeros((0, index.d), "float32")
+    shared = boilerplate.load_vectors(c["ref"] for c in meta if "ref" in c)
+    vecs = np.zeros((len(meta), index.d), dtype="float32")
+    for i, c in enumerate(meta):
+        row = _row(c, i)
+        vecs[i] = own[row] if row is not None else shared.get(c["ref"], 0.0)
+    return meta, vecs
+
+
+def search_chunks(file_id: str, q_vec: np.ndarray, k: int = 5):
+    """Top-k (score, chunk) over the file's own index rows and the boilerplate it references."""
+    index, meta = load_index(file_id)
+    hits = {}
+    if index.ntotal:
+        D, I = index.search(q_vec, min(k, index.ntotal))
+        by_row = {}
+        for i, c in enumerate(meta):
+            row = _row(c, i)
+            if row is not None:
+                by_row.setdefault(row, i)  # near-duplicates share the first chunk's row
+        for score, row in zip(D[0], I[0]):
+            if row >= 0:
+                hits[by_row[int(row)]] = float(score)
+    refs = [i for i, c in enumerate(meta) if "ref" in c]
+    if refs:
+        shared = boilerplate.load_vectors(meta[i]["ref"] for i in refs)
+        refs = [i for i in refs if meta[i]["ref"] in shared]
+        if refs:
+            scores = np.vstack([shared[meta[i]["ref"]] for i in refs]) @ q_vec[0]
+            for j in np.argsort(-scores)[:k]:
+                hits[refs[j]] = float(scores[j])
+    top = sorted(hits.items(), key=lambda kv: -kv[1])[:k]
+    return [(score, meta[i]) for i, score in top]
+
+
+def load_index_vectors(file_id: str) -> dict:
+    """Chunk text hash -> stored vector for an already indexed file (empty if none)."""
+    try:
+        meta, vecs = load_chunk_vectors(file_id)
+    except FileNotFoundError:
+        return {}
+    return {_text_key(c["text"]): vecs[i] for i, c in enumerate(meta)}
+
+
+def build_faiss_index(file_id: str, parent_id: Optional[str] = None, stats: Optional[dict] = None):
+    """
+    Generate embeddings and save FAISS index. With `parent_id`, chunks whose
+    text is unchanged from that earlier version keep their vectors. Chunks
+    that near-duplicate a passage other documents already carry (SEBI
+    disclaimers, definitions, standard risk factors) are not embedded or
+    indexed again: their metadata references the passage's vector, stored
+    once in the boilerplate registry. Near-duplicates within the document
+    share one index row.
+    """
+    if pages_path(file_id).exists():
+        chunks = chunk_pages(load_pages(file_id))
+    else:
+        chunks = chunk_text(load_sections(file_id))
     texts = [c["text"] for c in chunks]
 
-    # Compute embeddings
-    embeddings = EMBED_MODEL.encode(texts, batch_size=32, show_progress_bar=True, convert_to_numpy=True, normalize_embeddings=True)
+    matches = boilerplate.dedupe_chunks(file_id, texts, stats=stats)
+    shared = boilerplate.load_vectors(m["canon_id"] for m in matches if m and m["shared"])
+    own = []    # chunk positions that get an index row, in row order
+    rows = {}   # canon_id -> row of its first chunk in this document
+    for i, (c, m) in enumerate(zip(chunks, matches)):
+        if m is not None:
+            c["canon_id"] = m["canon_id"]
+            c["boilerplate"] = m["shared"]
+            if m["canon_id"] in shared:
+                c["ref"] = m["canon_id"]
+                continue
+            if m["canon_id"] in rows:
+                c["row"] = rows[m["canon_id"]]
+                continue
+            rows[m["canon_id"]] = len(own)
+        c["row"] = len(own)
+        own.append(i)
+
+    carried = load_index_vectors(parent_id) if parent_id else {}
+    dim = EMBED_MODEL.get_sentence_embedding_dimension()
+    embeddings = np.zeros((len(own), dim), dtype="float32")
+    todo = []
+    for r, i in enumerate(own):
+        vec = carried.get(_text_key(texts[i]))
+        if vec is not None:
+            embeddings[r] = vec
+        else:
+            todo.append(r)
+
+    # Cached vectors first; the rest is encoded batch by batch so a cancelled
+    # job stops between batches
+    if todo:
+        embeddings[todo] = encode_cached(
+            EMBED_MODEL, EMBED_MODEL_KEY, [texts[own[r]] for r in todo], batch_size=EMBED_BATCH_SIZE,
+            checkpoint=lambda: jobs.check_cancelled(file_id), stats=stats,
+        )
+    jobs.check_cancelled(file_id)
+    # later documents reference these instead of embedding the passage again
+    boilerplate.store_vectors({cid: embeddings[r] for cid, r in rows.items()})
+    if stats is not None:
+        stats["chunks_reused"] = len(own) - len(todo)
+        stats["chunks_referenced"] = sum(1 for c in chunks if "ref" in c)
+        stats["index_rows"] = len(own)
 
     # Save metadata
     meta_path = FAISS_DIR / f"{file_id}_meta.json"
@@ -55,7 +221,6 @@ def build_faiss_index(file_id: str):
         json.dump(chunks, f)
 
     # Build FAISS index
-    dim = embeddings.shape[1]
     index = faiss.IndexFlatIP(dim)  # cosine similarity since we normalized
     index.add(embeddings)
 
@@ -0,0 +1,79 @@
+import os
+
+import numpy as np
+import torch
+from scipy.special import softmax
+from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+from nlp.encoder_backends import export_onnx
+
+MODEL_NAME = "yiyanghkust/finbert-tone"
+LABELS = ["Positive", "Negative", "Neutral"]
+MAX_LENGTH = 128
+
+# torch (fp32, default) | torch-int8 | onnx | onnx-int8
+FINBERT_BACKEND = os.environ.get("FINBERT_BACKEND", "torch")
+# intra-op threads for torch / ONNX Runtime (0 = library default)
+FINBERT_THREADS = int(os.environ.get("FINBERT_THREADS", "0"))
+BACKENDS = ("torch", "torch-int8", "onnx", "onnx-int8")
+
+
+class FinBERT:
+    """FinBERT tone classifier behind a backend switch; returns softmax probabilities."""
+
+    def __init__(self, backend: str = FINBERT_BACKEND, threads: int = FINBERT_THREADS):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown FINBERT_BACKEND {backend!r}; expected one of {BACKENDS}")
+        self.backend = backend
+        self.tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+        model = AutoModelForSequenceClassification.from_pretrained(MODEL_NAME).eval()
+        if threads:
+            torch.set_num_threads(threads)
+        self.session = None
+        self.model = None
+        if backend == "torch":
+            self.model = model
+        elif backend == "torch-int8":
+            self.model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        else:
+            self._init_onnx(model, quantize=backend == "onnx-int8", threads=threads)
+
+    @property
+    def version(self) -> str:
+        """Identifies the scores this instance produces (for caches / persisted results)."""
+        return f"{MODEL_NAME}@{self.backend}"
+
+    def _init_onnx(self, model, quantize: bool, threads: int):
+        import onnxruntime as ort
+
+        path = export_onnx(model, self.tokenizer, MODEL_NAME, quantize=quantize, output="logits",
+                           output_axes={0: "batch"})
+        opts = ort.SessionOptions()
+        if threads:
+            opts.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(str(path), opts, providers=["CPUExecutionProvider"])
+        self._inputs = {i.name for i in self.session.get_inputs()}
+
+    def predict(self, sentences: list[str]) -> np.ndarray:
+        """(n, 3) probabilities in LABELS order for one batch of sentences."""
+        if self.session is not None:
+            enc = self.tokenizer(sentences, return_tensors="np", padding=True, truncation=True,
+                                 max_length=MAX_LENGTH)
+            feed = {k: v.astype(np.int64) for k, v in enc.items() if k in self._inputs}
+            logits = self.session.run(["logits"], feed)[0]
+        else:
+            enc = self.tokenizer(sentences, return_tensors="pt", padding=True, truncation=True,
+                                 max_length=MAX_LENGTH)
+            # no autograd bookkeeping: this is pure inference
+            with torch.inference_mode():
+                logits = self.model(**enc).logits.numpy()
+        return softmax(logits, axis=1)
+
+
+def load_finbert(backend: str = FINBERT_BACKEND) -> FinBERT:
+    """Load FinBERT for `backend`, falling back to fp32 torch if onnxruntime is missing."""
+    try:
+        return FinBERT(backend)
+    except ImportError as e:
+        print(f"⚠️ FinBERT backend {backend} unavailable ({e}); using torch fp32")
+        return FinBERT("torch")
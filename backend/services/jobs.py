@@ -0,0 +1,66 @@
+import shutil
+import threading
+from pathlib import Path
+from typing import Optional
+
+from services import boilerplate, risk_factors
+
+CORPUS_DIR = Path("data/corpus")
+FAISS_DIR = Path("data/faiss")
+TMP_DIR = Path("data/tmp")
+
+# file_id -> Event set when a cancel has been requested for that job
+_CANCEL_EVENTS: dict[str, threading.Event] = {}
+_LOCK = threading.Lock()
+
+
+class JobCancelled(Exception):
+    """Raised at a pipeline checkpoint once the job has been cancelled."""
+
+
+def _event(file_id: str) -> threading.Event:
+    with _LOCK:
+        ev = _CANCEL_EVENTS.get(file_id)
+        if ev is None:
+            ev = _CANCEL_EVENTS[file_id] = threading.Event()
+        return ev
+
+
+def request_cancel(file_id: str):
+    """Flag a job for cancellation; the pipeline stops at its next checkpoint."""
+    _event(file_id).set()
+
+
+def is_cancelled(file_id: str) -> bool:
+    with _LOCK:
+        ev = _CANCEL_EVENTS.get(file_id)
+    return ev is not None and ev.is_set()
+
+
+def check_cancelled(file_id: Optional[str]):
+    """Cancellation checkpoint: raise JobCancelled if the job was cancelled."""
+    if file_id is not None and is_cancelled(file_id):
+        raise JobCancelled(file_id)
+
+
+def clear(file_id: str):
+    """Forget the cancel flag once the job has finished (any outcome)."""
+    with _LOCK:
+        _CANCEL_EVENTS.pop(file_id, None)
+
+
+def cleanup_artifacts(file_id: str):
+    """Remove partial outputs a cancelled job may have left behind."""
+    for path in (
+        CORPUS_DIR / f"{file_id}.jsonl",
+        CORPUS_DIR / f"{file_id}.pages.jsonl",
+        CORPUS_DIR / f"{file_id}.risk.json",
+        CORPUS_DIR / f"{file_id}.lexicon.json",
+        CORPUS_DIR / f"{file_id}.sents.npz",
+        FAISS_DIR / f"{file_id}.index",
+        FAISS_DIR / f"{file_id}_meta.json",
+    ):
+        path.unlink(missing_ok=True)
+    shutil.rmtree(TMP_DIR / file_id, ignore_errors=True)
+    boilerplate.forget_file(file_id)
+    risk_factors.forget_file(file_id)
@@ -0,0 +1,165 @@
+"""
+Loughran-McDonald lexicon scoring. The category word lists are read from a
+local copy of the LM Master Dictionary CSV (a word is in a category when its
+column holds the positive year it was added; a negative year marks its
+removal) and compiled into one vocabulary -> category matrix; texts are
+scored with a single tokenizer pass. The Risk Factors profile of every file
+is computed at ingest and stored next to its corpus, so it is available
+without running any model.
+"""
+import csv
+import hashlib
+import json
+import os
+import re
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from nlp.sentences import load_risk_sentences
+
+CORPUS_DIR = Path("data/corpus")
+LEXICON_PATH = Path(os.environ.get("LM_LEXICON_PATH", "data/meta/Loughran-McDonald_MasterDictionary.csv"))
+
+# category -> Master Dictionary columns that feed it
+CATEGORIES = {
+    "uncertainty": ("Uncertainty",),
+    "litigious": ("Litigious",),
+    "constraining": ("Constraining",),
+    "negative": ("Negative",),
+    "modal": ("Strong_Modal", "Weak_Modal"),
+}
+
+_TOKEN = re.compile(r"[a-z]+(?:'[a-z]+)?")
+
+
+class Lexicon:
+    """Word -> category membership, scored over sentences in one pass."""
+
+    def __init__(self, words: dict[str, set[str]], version: str = "", categories: Optional[list[str]] = None,
+                 base: Optional[dict[str, str]] = None):
+        self.version = version
+        self.categories = list(categories or CATEGORIES)
+        self.vocab = {w: i for i, w in enumerate(sorted(words))}
+        self.matrix = np.zeros((len(self.vocab), len(self.categories)), dtype=np.int32)
+        for w, cats in words.items():
+            for c in cats:
+                self.matrix[self.vocab[w], self.categories.index(c)] = 1
+        # word id -> id of its base form (itself unless `base` maps it), for distinct counts
+        self.base = np.arange(len(self.vocab), dtype=np.int64)
+        for w, b in (base or {}).items():
+            self.base[self.vocab[w]] = self.vocab[b]
+
+    def count(self, sentences: list[str], distinct: bool = False):
+        """
+        (category hits, word counts) per sentence: an (n, n_categories) int
+        matrix and an (n,) vector, from one tokenizer pass over the joined
+        text. With `distinct`, a word repeated within a sentence hits once,
+        and so do inflections sharing a base form.
+        """
+        n = len(sentences)
+        if n == 0:
+            return np.zeros((0, len(self.categories)), dtype=np.int64), np.zeros(0, dtype=np.int64)
+        sentences = [s.lower() for s in sentences]  # lower() can change length, so before offsets
+        starts = np.cumsum([0] + [len(s) + 1 for s in sentences[:-1]])
+        pos, ids = [], []
+        for m in _TOKEN.finditer("\n".join(sentences)):
+            pos.append(m.start())
+            ids.append(self.vocab.get(m.group(), -1))
+        sent = np.searchsorted(starts, np.asarray(pos, dtype=np.int64), side="right") - 1
+        ids = np.asarray(ids, dtype=np.int64)
+        words = np.bincount(sent, minlength=n)
+        hits = np.zeros((n, len(self.categories)), dtype=np.int64)
+        known = ids >= 0
+        sent, ids = sent[known], ids[known]
+        if distinct and len(ids):
+            pairs = np.unique(sent * len(self.vocab) + self.base[ids])
+            sent, ids = pairs // len(self.vocab), pairs % len(self.vocab)
+        np.add.at(hits, sent, self.matrix[ids])
+        return hits, words
+
+    def profile(self, sentences: list[str]) -> dict:
+        """Section-level counts and densities (hits per word) for every category."""
+        hits, words = self.count(sentences)
+        total = int(words.sum())
+        per_cat = hits.sum(axis=0)
+        return {
+            "words": total,
+            "counts": {c: int(k) for c, k in zip(self.categories, per_cat)},
+            "densities": {c: round(float(k) / max(total, 1), 4) for c, k in zip(self.categories, per_cat)},
+        }
+
+    def densities(self, sentences: list[str]) -> np.ndarray:
+        """(n, n_categories) per-sentence densities."""
+        hits, words = self.count(sentences)
+        return hits / np.maximum(words, 1)[:, None]
+
+
+def load_lexicon(path: Path = LEXICON_PATH) -> Lexicon:
+    if not path.exists():
+        raise FileNotFoundError(f"Loughran-McDonald dictionary not found at {path}")
+    words: dict[str, set[str]] = {}
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            cats = {c for c, cols in CATEGORIES.items() if any(_member(row.get(col)) for col in cols)}
+            if cats:
+                words[row["Word"].lower()] = cats
+    version = hashlib.sha1(path.read_bytes()).hexdigest()[:12]
+    print(f"📖 Loaded {len(words)} Loughran-McDonald words from {path}")
+    return Lexicon(words, version=version)
+
+
+def _member(value) -> bool:
+    """A category column holds the year a word was added (> 0) or removed (< 0)."""
+    try:
+        return int(float(value)) > 0
+    except (TypeError, ValueError):
+        return False
+
+
+_lexicon = None
+
+
+def get_lexicon():
+    """The shared Lexicon, or None when no dictionary file is installed."""
+    global _lexicon
+    if _lexicon is None:
+        try:
+            _lexicon = load_lexicon()
+        except FileNotFoundError as e:
+            print(f"⚠️ {e}; lexicon features disabled")
+            _lexicon = False
+    return _lexicon or None
+
+
+def profile_path(file_id: str) -> Path:
+    return CORPUS_DIR / f"{file_id}.lexicon.json"
+
+
+def index_file(file_id: str) -> Optional[dict]:
+    """
+    Profile the file's Risk Factors sentences and store it next to the
+    corpus. Returns the profile (None without a dictionary).
+    """
+    lex = get_lexicon()
+    if lex is None:
+        return None
+    profile = lex.profile(load_risk_sentences(file_id))
+    with open(profile_path(file_id), "w", encoding="utf-8") as f:
+        json.dump({"dictionary": lex.version, "profile": profile}, f)
+    return profile
+
+
+def file_profile(file_id: str) -> Optional[dict]:
+    """The profile stored at ingest; recomputed if missing or built from another dictionary."""
+    lex = get_lexicon()
+    if lex is None:
+        return None
+    path = profile_path(file_id)
+    if path.exists():
+        with open(path, "r", encoding="utf-8") as f:
+            stored = json.load(f)
+        if stored.get("dictionary") == lex.version:
+            return stored["profile"]
+    return index_file(file_id)
@@ -1,28 +1,53 @@
 import time
 import json
+import shutil
 from pathlib import Path
-import fitz  # PyMuPDF
+from typing import Optional
 
-from store.db import set_status
-from services.embedding import build_faiss_index  # new import
+from store.db import get_parent, set_status
+from nlp.extractors import DEFAULT_BACKEND
+from nlp.extract_text import iter_pages
+from nlp.utils import peak_rss_mb
+from nlp.sentences import save_offsets, sentence_spans, sentences_path
+from services.embedding import build_faiss_index, pages_path  # new import
+from services import jobs, lexicon, risk_factors
 
 # Directory setup
 RAW_DIR = Path("data/raw")
 CORPUS_DIR = Path("data/corpus")
+TMP_DIR = Path("data/tmp")
 CORPUS_DIR.mkdir(parents=True, exist_ok=True)
 
 
 # ----------- 1️⃣ PDF Text Extraction ----------- #
-def extract_text_pymupdf(pdf_path: Path):
+def iter_pages_text(pdf_path: Path, file_id: Optional[str] = None, backend: str = DEFAULT_BACKEND,
+                    stats: Optional[dict] = None, reuse: Optional[dict] = None):
+    """
+    Yield page-wise text (PyMuPDF by default, with per-page pdfplumber/OCR
+    fallback). Each page runs in an isolated worker with a time/memory limit;
+    pages that cannot be read at all are skipped. If `stats` is given it is
+    filled with page counts per extractor, the skipped pages and why, and
+    OCR cache hits/time saved.
+    `reuse` maps page fingerprints of an earlier version to their text.
+    """
+    stats = stats if stats is not None else {}
+    sources = stats.setdefault("pages_by_source", {})
+    for page in iter_pages(str(pdf_path), backend=backend, reuse=reuse):
+        sources[page["source"]] = sources.get(page["source"], 0) + 1
+        if page["source"] == "skipped":
+            stats.setdefault("skipped_pages", []).append({"page_num": page["page_num"], "reason": page["reason"]})
+        stats["ocr_saved_s"] = round(stats.get("ocr_saved_s", 0.0) + page["ocr_saved_s"], 2)
+        if page["text"].strip():
+            yield {"page_num": page["page_num"], "text": page["text"], "fp": page["fp"]}
+        # checkpoint before the next page is extracted
+        jobs.check_cancelled(file_id)
+    ocr_pages = sources.get("ocr", 0) + sources.get("ocr_cache", 0)
+    stats["ocr_cache_hit_rate"] = round(sources.get("ocr_cache", 0) / ocr_pages, 3) if ocr_pages else 0.0
+
+
+def extract_text_pymupdf(pdf_path: Path, file_id: Optional[str] = None):
     """Extract page-wise text using PyMuPDF."""
-    doc = fitz.open(pdf_path)
-    pages = []
-    for i, page in enumerate(doc):
-        text = page.get_text("text")
-        if text.strip():
-            pages.append({"page_num": i + 1, "text": text})
-    doc.close()
-    return pages
+    return list(iter_pages_text(pdf_path, file_id=file_id, backend="pymupdf"))
 
 
 # ----------- 2️⃣ Section Detection ----------- #
@@ -65,36 +90,143 @@ def sectionize(pages: list[dict]) -> list[dict]:
     return result
 
 
+def write_corpus(pages, out_path: Path, spill_dir: Path, manifest_path: Optional[Path] = None,
+                 offsets_path: Optional[Path] = None) -> int:
+    """
+    Streaming equivalent of sectionize() + JSONL write. Page text is appended
+    to a per-section spill file as it arrives, so only one page (and, while
+    writing the corpus, one section) is held in memory. If `manifest_path` is
+    given, a per-page manifest {page_num, section, fp, text} is written too;
+    with `offsets_path`, every section is sentence-segmented once here and
+    the offsets saved for downstream consumers. Returns pages seen.
+    """
+    shutil.rmtree(spill_dir, ignore_errors=True)  # leftovers from an earlier attempt
+    spill_dir.mkdir(parents=True, exist_ok=True)
+    manifest = open(manifest_path, "w", encoding="utf-8") if manifest_path else None
+    order: list[str] = []
+    n_pages = 0
+    try:
+        for p in pages:
+            n_pages += 1
+            section = detect_sections(p["text"])
+            if section not in order:
+                order.append(section)
+            part = spill_dir / f"{order.index(section)}.txt"
+            with open(part, "a", encoding="utf-8") as f:
+                f.write("\n" + p["text"])
+            if manifest:
+                manifest.write(json.dumps({
+                    "page_num": p["page_num"], "section": section, "fp": p.get("fp"), "text": p["text"]
+                }) + "\n")
+    finally:
+        if manifest:
+            manifest.close()
+
+    spans = []
+    with open(out_path, "w", encoding="utf-8") as out:
+        for i, name in enumerate(order):
+            text = (spill_dir / f"{i}.txt").read_text(encoding="utf-8").strip()
+            out.write(json.dumps({"section": name, "text": text}) + "\n")
+            if offsets_path:
+                spans.append(sentence_spans(text))
+    if offsets_path:
+        save_offsets(offsets_path, spans)
+    shutil.rmtree(spill_dir, ignore_errors=True)
+    return n_pages
+
+
+def load_page_texts(file_id: str) -> dict:
+    """
+    Page fingerprint -> text for an already ingested version (empty if
+    unknown). A fingerprint shared by parent pages with different text is
+    ambiguous and left out, so those pages are extracted afresh.
+    """
+    path = pages_path(file_id)
+    reuse = {}
+    if not path.exists():
+        print(f"⚠️ No page manifest for {file_id}; re-extracting every page")
+        return reuse
+    ambiguous = set()
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            p = json.loads(line)
+            fp = p.get("fp")
+            if not fp:
+                continue
+            if fp in reuse and reuse[fp] != p["text"]:
+                ambiguous.add(fp)
+            reuse.setdefault(fp, p["text"])
+    for fp in ambiguous:
+        del reuse[fp]
+    if ambiguous:
+        print(f"⚠️ {len(ambiguous)} page fingerprints of {file_id} are ambiguous; not reusing them")
+    return reuse
+
+
 # ----------- 4️⃣ Full Pipeline ----------- #
 def process_pipeline(file_id: str):
     """
     Background task:
     PDF → Extract text → Sectionize → Chunk + Embed → FAISS
+
+    If the file is linked to an earlier version of the same prospectus
+    (set_parent at upload, e.g. the DRHP for an RHP), unchanged pages reuse
+    the parent's text and unchanged chunks reuse its vectors.
     """
+    parent_id = get_parent(file_id)
     pdf_path = RAW_DIR / f"{file_id}.pdf"
-    set_status(file_id, "parsing")
+    timings: dict = {}
+    t_start = time.perf_counter()
 
     try:
-        # 1. Extract text
-        pages = extract_text_pymupdf(pdf_path)
+        # cancelled while still queued
+        jobs.check_cancelled(file_id)
+        set_status(file_id, "parsing")
 
-        # 2. Detect and merge sections
-        sections = sectionize(pages)
-
-        # 3. Save to corpus as JSONL
+        # 1-3. Extract text page by page, detect sections and spill straight
+        #      to the corpus JSONL without holding the document in memory
         out_path = CORPUS_DIR / f"{file_id}.jsonl"
-        with open(out_path, "w", encoding="utf-8") as f:
-            for s in sections:
-                f.write(json.dumps(s) + "\n")
+        reuse = load_page_texts(parent_id) if parent_id else None
+        t0 = time.perf_counter()
+        n_pages = write_corpus(
+            iter_pages_text(pdf_path, file_id=file_id, stats=timings, reuse=reuse),
+            out_path, TMP_DIR / file_id / "sections", manifest_path=pages_path(file_id),
+            offsets_path=sentences_path(file_id),
+        )
+        timings["extract_s"] = round(time.perf_counter() - t0, 2)
+        print(f"📄 Extracted {n_pages} pages for {file_id}, peak RSS (MB): {peak_rss_mb()}")
 
         # 4. Build FAISS index
+        jobs.check_cancelled(file_id)
         set_status(file_id, "embedding")
-        total_chunks = build_faiss_index(file_id)
+        t0 = time.perf_counter()
+        total_chunks = build_faiss_index(file_id, parent_id=parent_id, stats=timings)
+        timings["embed_s"] = round(time.perf_counter() - t0, 2)
         print(f"✅ Built FAISS index with {total_chunks} chunks for {file_id}")
 
+        # 4b. Segment Risk Factors into items and add them to the corpus-wide clusters
+        jobs.check_cancelled(file_id)
+        t0 = time.perf_counter()
+        n_factors = risk_factors.index_file(file_id, stats=timings)
+        timings["risk_factors_s"] = round(time.perf_counter() - t0, 2)
+        print(f"🧩 Indexed {n_factors} risk factors for {file_id}")
+
+        # 4c. Loughran-McDonald profile of the Risk Factors, so it needs no model later
+        t0 = time.perf_counter()
+        if lexicon.index_file(file_id) is not None:
+            timings["lexicon_s"] = round(time.perf_counter() - t0, 2)
+
         # 5. Done
+        timings["total_s"] = round(time.perf_counter() - t_start, 2)
+        print(f"⏱️ Pipeline timings for {file_id}: {timings}")
         set_status(file_id, "done")
 
+    except jobs.JobCancelled:
+        print(f"🛑 Pipeline cancelled for {file_id}")
+        jobs.cleanup_artifacts(file_id)
+        set_status(file_id, "cancelled")
     except Exception as e:
         print("❌ Error in pipeline:", e)
         set_status(file_id, "error")
+    finally:
+        jobs.clear(file_id)
@@ -1,86 +1,307 @@
+import hashlib
 import json
-import re
+import os
 import numpy as np
 import pandas as pd
 from pathlib import Path
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
-from scipy.special import softmax
+
+from nlp.batching import length_batches, token_lengths
+from nlp.embed_cache import normalize_text
+from nlp.sentences import load_risk_sentences, split_sentences
+from store.cache import KVCache, CACHE_DIR
+from services.finbert import LABELS as labels, MAX_LENGTH, load_finbert
+from services import lexicon, risk_fast
+from services.lexicon import Lexicon, get_lexicon
 
 CORPUS_DIR = Path("data/corpus")
 
-# Load FinBERT
-MODEL_NAME = "yiyanghkust/finbert-tone"
-tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
-model = AutoModelForSequenceClassification.from_pretrained(MODEL_NAME)
-labels = ["Positive", "Negative", "Neutral"]
+# Load FinBERT (FINBERT_BACKEND / FINBERT_THREADS select backend and threads)
+FINBERT = load_finbert()
+tokenizer = FINBERT.tokenizer
+# Padded-token budget per FinBERT batch; short sentences batch far wider than 8
+FINBERT_MAX_TOKENS = 2048
+# FinBERT probabilities per normalized sentence, shared across prospectuses
+SENTIMENT_CACHE = KVCache(
+    CACHE_DIR / "sentiment.db", max_bytes=int(os.environ.get("SENTIMENT_CACHE_MB", "128")) * 1024 * 1024
+)
+
+# Bump when the score or the stored result changes for the same model and
+# corpus, so results persisted by an older scorer are recomputed
+RISK_SCORING_VERSION = 3  # 2: uncertainty words counted once per sentence; 3: once per base form
 
-# Optional: Loughran-McDonald Uncertainty Lexicon (tiny version)
-UNCERTAINTY_WORDS = {
-    "may", "could", "might", "uncertain", "fluctuate", "volatile",
-    "risk", "depend", "contingent", "exposure", "litigation"
+# accurate: FinBERT over every sentence | fast: distilled regressor on stored chunk vectors
+RISK_MODES = ("accurate", "fast")
+
+# Optional: Loughran-McDonald Uncertainty Lexicon (tiny version), as base
+# form -> inflections. Matched as whole words, so inflections are listed
+# ("may" must not hit "mayor"); a sentence counts each base form once.
+UNCERTAINTY_FORMS = {
+    "may": (), "could": (), "might": (),
+    "uncertain": ("uncertainty", "uncertainties"),
+    "fluctuate": ("fluctuates", "fluctuation", "fluctuations"),
+    "volatile": ("volatility",),
+    "risk": ("risks",),
+    "depend": ("depends", "dependent", "dependence"),
+    "contingent": ("contingency", "contingencies"),
+    "exposure": ("exposures",),
+    "litigation": (),
 }
+UNCERTAINTY_WORDS = {w for b, forms in UNCERTAINTY_FORMS.items() for w in (b, *forms)}
+UNCERTAINTY = Lexicon(
+    {w: {"uncertainty"} for w in UNCERTAINTY_WORDS}, categories=["uncertainty"],
+    base={w: b for b, forms in UNCERTAINTY_FORMS.items() for w in forms},
+)
 
 def load_risk_text(file_id: str) -> str:
     """Return text of the 'Risk Factors' section from corpus JSONL."""
-    path = CORPUS_DIR / f"{file_id}.jsonl"
-    if not path.exists():
-        raise FileNotFoundError(f"No parsed corpus found for {file_id}")
-    text = ""
-    with open(path, "r", encoding="utf-8") as f:
-        for line in f:
-            d = json.loads(line.strip().replace("'", '"'))
-            if d["section"].lower().startswith("risk"):
-                text += "\n" + d["text"]
-    return text.strip() if text else None
-
-
-def finbert_sentiment(text: str, batch_size: int = 8):
-    """Split text into sentences and compute FinBERT sentiment."""
-    sentences = re.split(r'(?<=[.!?])\s+', text)
-    results = []
-    for i in range(0, len(sentences), batch_size):
-        batch = sentences[i:i+batch_size]
-        inputs = tokenizer(batch, return_tensors="pt", padding=True, truncation=True, max_length=128)
-        outputs = model(**inputs)
-        scores = softmax(outputs.logits.detach().numpy(), axis=1)
-        for s, p in zip(batch, scores):
-            results.append({
-                "sentence": s.strip(),
-                "positive": float(p[0]),
-                "negative": float(p[1]),
-                "neutral": float(p[2]),
-                "dominant": labels[int(np.argmax(p))]
-            })
-    return pd.DataFrame(results)
+    return "\n".join(load_risk_sentences(file_id)) or None
 
 
-def compute_risk_score(df: pd.DataFrame) -> float:
-    """Weighted risk score: higher if many negatives + uncertainty words."""
-    neg_ratio = (df["dominant"] == "Negative").mean()
-    unc_density = df["sentence"].str.lower().apply(
-        lambda x: sum(w in x for w in UNCERTAINTY_WORDS)
-    ).sum() / max(len(df), 1)
+def sentiment_key(sentence: str) -> str:
+    return FINBERT.version + ":" + hashlib.sha1(normalize_text(sentence).encode("utf-8")).hexdigest()
+
+
+def iter_sentiment(sentences: list[str], batch_size: int = 64, stats: dict = None):
+    """
+    Yield (positions, probabilities) as sentences get FinBERT scores: all
+    SENTIMENT_CACHE hits first, then one item per scored batch. Unseen
+    sentences are scored once each, in length-bucketed batches (up to
+    `batch_size` sentences and FINBERT_MAX_TOKENS padded tokens).
+    """
+    keys = [sentiment_key(s) for s in sentences]
+    hits = SENTIMENT_CACHE.get_many(list(set(keys)))
+
+    cached = []
+    todo = {}  # key -> positions, so repeated sentences are scored once
+    for i, k in enumerate(keys):
+        if k in hits:
+            cached.append(i)
+        else:
+            todo.setdefault(k, []).append(i)
+    if stats is not None:
+        stats["sentences"] = len(sentences)
+        stats["sentence_cache_hits"] = len(cached)
+    if cached:
+        yield np.asarray(cached), np.vstack([np.frombuffer(hits[keys[i]], dtype="float32") for i in cached])
+
+    pending = list(todo)
+    pending_sentences = [sentences[todo[k][0]] for k in pending]
+    lengths = token_lengths(pending_sentences, tokenizer, MAX_LENGTH)
+    for idx in length_batches(lengths, FINBERT_MAX_TOKENS, batch_size):
+        probs = np.asarray(FINBERT.predict([pending_sentences[i] for i in idx]), dtype="float32")
+        SENTIMENT_CACHE.put_many({pending[i]: p.tobytes() for i, p in zip(idx, probs)})
+        rows = [r for r, i in enumerate(idx) for _ in todo[pending[i]]]
+        yield np.asarray([j for i in idx for j in todo[pending[i]]]), probs[rows]
+
+
+def sentiment_frame(sentences: list[str], probs: np.ndarray) -> pd.DataFrame:
+    probs = probs.astype(np.float64)
+    return pd.DataFrame({
+        "sentence": sentences,
+        "positive": probs[:, 0],
+        "negative": probs[:, 1],
+        "neutral": probs[:, 2],
+        "dominant": np.asarray(labels)[probs.argmax(axis=1)],
+    })
+
+
+def finbert_sentiment(text: str = None, batch_size: int = 64, stats: dict = None, sentences: list[str] = None):
+    """
+    Compute FinBERT sentiment per sentence of `text` (or of pre-split
+    `sentences`), cached, see iter_sentiment. Rows come back in text order.
+    """
+    if sentences is None:
+        sentences = split_sentences(text)
+    probs = np.zeros((len(sentences), len(labels)), dtype="float32")
+    for pos, p in iter_sentiment(sentences, batch_size, stats):
+        probs[pos] = p
+    return sentiment_frame(sentences, probs)
+
+
+def _risk_score(neg_ratio: float, unc_density: float) -> float:
     score = (0.7 * neg_ratio + 0.3 * unc_density) * 100
     return round(min(score, 100), 2)
 
 
-def analyze_risk(file_id: str):
-    """End-to-end risk analysis for a given file."""
-    text = load_risk_text(file_id)
-    if not text:
+def lexicon_counts(sentences: list[str]) -> np.ndarray:
+    """
+    Distinct uncertainty base forms per sentence ("risk" and "risks" in one
+    sentence count once, as in the original score), see Lexicon.count.
+    """
+    return UNCERTAINTY.count(sentences, distinct=True)[0][:, 0]
+
+
+def compute_risk_score(df: pd.DataFrame) -> float:
+    """Weighted risk score: higher if many negatives + uncertainty words."""
+    n = max(len(df), 1)
+    neg_ratio = np.count_nonzero(df["dominant"].to_numpy() == "Negative") / n
+    unc_density = lexicon_counts(df["sentence"].tolist()).sum() / n
+    return _risk_score(neg_ratio, unc_density)
+
+
+def add_lexicon_columns(df: pd.DataFrame):
+    """Per-sentence LM category densities as lm_<category> columns."""
+    lex = get_lexicon()
+    if lex is None:
+        return
+    dens = lex.densities(df["sentence"].tolist())
+    for j, cat in enumerate(lex.categories):
+        df["lm_" + cat] = dens[:, j]
+
+
+def analyze_risk_fast(file_id: str):
+    """
+    Risk analysis from the chunk vectors stored at ingest: the distilled
+    regressor (services.risk_fast) stands in for FinBERT, sentence-weighted
+    per chunk. Uncertainty density is lexical and computed exactly. The
+    regressor scores chunks, not sentences, so top_negatives holds the most
+    negative chunks as {'chunk', 'negative'} (accurate mode: {'sentence', ...}).
+    """
+    df = risk_fast.predict_chunks(file_id)
+    if df.empty:
+        raise ValueError("No 'Risk Factors' section found.")
+
+    w = df["n_sentences"]
+    n = w.sum()
+    unc = lexicon_counts([s for t in df["text"] for s in split_sentences(t)]).sum()
+    score = _risk_score((df["neg_ratio"] * w).sum() / n, unc / n)
+    negatives = [
+        {"chunk": r["text"], "negative": round(float(r["negative"]), 3)}
+        for _, r in df.nlargest(5, "negative").iterrows()
+    ]
+    return {
+        "file_id": file_id,
+        "mode": "fast",
+        "risk_score": score,
+        "avg_positive": round((df["positive"] * w).sum() / n, 3),
+        "avg_negative": round((df["negative"] * w).sum() / n, 3),
+        "avg_neutral": round((df["neutral"] * w).sum() / n, 3),
+        "top_negatives": negatives,
+        "lexicon": lexicon.file_profile(file_id),
+    }
+
+
+def corpus_hash(file_id: str) -> str:
+    h = hashlib.sha1()
+    with open(CORPUS_DIR / f"{file_id}.jsonl", "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def risk_result_path(file_id: str) -> Path:
+    return CORPUS_DIR / f"{file_id}.risk.json"
+
+
+def load_risk_result(file_id: str):
+    """Stored FinBERT result for this file, if it matches the current corpus, model and scorer."""
+    path = risk_result_path(file_id)
+    corpus = CORPUS_DIR / f"{file_id}.jsonl"
+    if not path.exists() or not corpus.exists():
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        stored = json.load(f)
+    if stored.get("model") != FINBERT.version or stored.get("scoring") != RISK_SCORING_VERSION:
+        return None
+    if stored.get("corpus_hash") != corpus_hash(file_id):
+        return None
+    return stored
+
+
+def save_risk_result(file_id: str, result: dict, df: pd.DataFrame):
+    stored = {
+        "corpus_hash": corpus_hash(file_id),
+        "model": FINBERT.version,
+        "scoring": RISK_SCORING_VERSION,
+        "result": result,
+        "sentences": df.to_dict("records"),
+    }
+    path = risk_result_path(file_id)
+    tmp = path.with_suffix(".json.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(stored, f, ensure_ascii=False)
+    tmp.replace(path)  # readers never see a half-written file
+
+
+def analyze_risk(file_id: str, mode: str = "accurate"):
+    """End-to-end risk analysis for a given file (`mode` is "accurate" or "fast")."""
+    if mode not in RISK_MODES:
+        raise ValueError(f"Unknown risk mode {mode!r}; expected one of {RISK_MODES}")
+    if mode == "fast":
+        try:
+            return analyze_risk_fast(file_id)
+        except (FileNotFoundError, risk_fast.FastModelMismatch) as e:
+            # no usable model or no index for this file: score it with FinBERT instead
+            print(f"⚠️ Fast risk mode unavailable ({e}); using FinBERT")
+
+    stored = load_risk_result(file_id)
+    if stored is not None:
+        return {**stored["result"], "lexicon": lexicon.file_profile(file_id), "cached": True}
+
+    sentences = load_risk_sentences(file_id)
+    if not sentences:
         raise ValueError("No 'Risk Factors' section found.")
 
-    df = finbert_sentiment(text)
+    stats = {}
+    df = finbert_sentiment(sentences=sentences, stats=stats)
+    return _accurate_result(file_id, df, stats)
+
+
+def _accurate_result(file_id: str, df: pd.DataFrame, stats: dict) -> dict:
     score = compute_risk_score(df)
+    add_lexicon_columns(df)
 
     # top negative sentences
     negatives = df[df["dominant"] == "Negative"].nlargest(5, "negative")[["sentence", "negative"]].to_dict("records")
 
-    return {
+    result = {
         "file_id": file_id,
+        "mode": "accurate",
         "risk_score": score,
         "avg_positive": round(df["positive"].mean(), 3),
         "avg_negative": round(df["negative"].mean(), 3),
         "avg_neutral": round(df["neutral"].mean(), 3),
-        "top_negatives": negatives
+        "top_negatives": negatives,
+        "sentence_cache_hit_ratio": round(stats["sentence_cache_hits"] / max(stats["sentences"], 1), 3),
     }
+    save_risk_result(file_id, result, df)
+    # the lexicon profile is stored at ingest, independent of the model
+    return {**result, "lexicon": lexicon.file_profile(file_id), "cached": False}
+
+
+def iter_analyze_risk(file_id: str, batch_size: int = 64):
+    """
+    Accurate-mode analyze_risk as a stream of events: "progress" after the
+    cache lookup and after every FinBERT batch (running score, negative
+    ratio and top negatives over the sentences scored so far), then one
+    "result" with exactly what analyze_risk returns.
+    """
+    if load_risk_result(file_id) is not None:
+        yield {"event": "result", **analyze_risk(file_id)}
+        return
+
+    sentences = load_risk_sentences(file_id)
+    if not sentences:
+        raise ValueError("No 'Risk Factors' section found.")
+
+    unc = lexicon_counts(sentences)
+    probs = np.zeros((len(sentences), len(labels)), dtype="float32")
+    done = np.zeros(len(sentences), dtype=bool)
+    stats = {}
+    for pos, p in iter_sentiment(sentences, batch_size, stats):
+        probs[pos] = p
+        done[pos] = True
+        k = int(done.sum())
+        neg = done & (probs.argmax(axis=1) == 1)
+        neg_ratio = neg.sum() / k
+        idx = np.flatnonzero(neg)
+        top = idx[np.argsort(-probs[idx, 1])[:5]]
+        yield {
+            "event": "progress",
+            "scored": k,
+            "total": len(sentences),
+            "risk_score": _risk_score(neg_ratio, unc[done].sum() / k),
+            "neg_ratio": round(float(neg_ratio), 3),
+            "top_negatives": [{"sentence": sentences[i], "negative": float(probs[i, 1])} for i in top],
+        }
+    yield {"event": "result", **_accurate_result(file_id, sentiment_frame(sentences, probs), stats)}
@@ -0,0 +1,243 @@
+import os
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from nlp.sentences import sentence_spans
+
+DB_PATH = Path("data/meta/risk_factors.db")
+DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+
+# An item joins the nearest cluster when its cosine to the centroid is at
+# least this; otherwise it starts a new cluster (single-pass leader clustering).
+CLUSTER_SIMILARITY = float(os.environ.get("RISK_CLUSTER_SIMILARITY", "0.75"))
+
+# "12. Our business depends on ..." at the start of a line
+_HEADING = re.compile(r"^[ \t]*(\d{1,3})[ \t]*[.)][ \t]+(?=[A-Z\"'“])", re.M)
+# "External Risks" / "Risks Related to Our Business" on a line of its own
+_SUBHEADING = re.compile(r"^[ \t]*(?:[A-Z][\w,&.-]*[ \t]+){0,6}(?:Risks?|RISKS?)\b[^\n.]{0,80}$", re.M)
+_LOCK = threading.Lock()
+_centroids = {}  # model key -> (cluster ids, normalized centroid matrix), rebuilt after writes
+
+
+def get_conn():
+    conn = sqlite3.connect(DB_PATH, timeout=30)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def init_db():
+    with get_conn() as conn:
+        c = conn.cursor()
+        c.execute("""
+        CREATE TABLE IF NOT EXISTS clusters(
+            cluster_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            model TEXT,
+            label TEXT,
+            vsum BLOB,
+            size INTEGER DEFAULT 0
+        );
+        """)
+        c.execute("""
+        CREATE TABLE IF NOT EXISTS items(
+            file_id TEXT,
+            item_no INTEGER,
+            heading TEXT,
+            cluster_id INTEGER,
+            vec BLOB,
+            PRIMARY KEY(file_id, item_no)
+        );
+        """)
+        c.execute("CREATE INDEX IF NOT EXISTS items_cluster ON items(cluster_id)")
+        conn.commit()
+
+
+def _opens_paragraph(text: str, pos: int) -> bool:
+    """
+    Whether the line at `pos` starts a new block: it follows a blank line, a
+    finished sentence or a sub-heading, not a line introducing a list
+    ("...our key customers are:") or a sentence wrapped mid-way.
+    """
+    before = text[:pos].rstrip(" \t")
+    before = before[:-1] if before.endswith("\n") else before
+    prev = before.rsplit("\n", 1)[-1].strip()
+    return not prev or prev[-1] in ".!?\"'”’)]" or bool(_SUBHEADING.match(prev))
+
+
+def segment_risk_factors(text: str) -> list[dict]:
+    """
+    Split a Risk Factors section into its numbered items
+    [{'no', 'heading', 'text'}]. Numbering must start at 1 and run on
+    consecutively; a restart at 1 is taken only after a sub-heading such as
+    "External Risks". Of all such sequences the longest is kept, preferring
+    marks that open a paragraph and are not part of a numbered list inside
+    an item (a run that starts with a "1." introduced by "...are:").
+    """
+    found = [(int(m.group(1)), m.start(), m.end()) for m in _HEADING.finditer(text)]
+    # 1 for marks that look like list entries rather than item headings
+    penalty, run = [], None
+    for k, (no, start, _) in enumerate(found):
+        opens = _opens_paragraph(text, start)
+        if run is not None and no == run:
+            run += 1
+            penalty.append(1)
+        elif no == 1 and k and not opens:
+            run = 2
+            penalty.append(1)
+        else:
+            run = None
+            penalty.append(int(not opens))
+    restart = [no == 1 and bool(_SUBHEADING.search(text, found[k - 1][2] if k else 0, start))
+               for k, (no, start, _) in enumerate(found)]
+
+    # longest valid sequence ending at each mark, fewest penalties on ties
+    best, prev = [], []
+    for k, (no, _, _) in enumerate(found):
+        score, link = ((1, -penalty[k]), None) if no == 1 else (None, None)
+        for j in range(k):
+            if found[j][0] == no - 1 or restart[k]:
+                cand = (best[j][0] + 1, best[j][1] - penalty[k]) if best[j] else None
+                if cand and (score is None or cand >= score):
+                    score, link = cand, j
+        best.append(score)
+        prev.append(link)
+    ends = [k for k in range(len(found)) if best[k]]
+    chain = []
+    k = max(ends, key=lambda i: (best[i], i)) if ends else None
+    while k is not None:
+        chain.append(k)
+        k = prev[k]
+    marks = [found[k] for k in reversed(chain)]
+    items = []
+    for i, (no, _, body_start) in enumerate(marks):
+        end = marks[i + 1][1] if i + 1 < len(marks) else len(text)
+        body = " ".join(text[body_start:end].split())
+        first = sentence_spans(body[:1000])
+        heading = body[first[0][0]:first[0][1]][:300] if first else ""
+        items.append({"no": len(items) + 1, "heading": heading, "text": body})
+    return items
+
+
+def _load_centroids(conn, model: str):
+    if model not in _centroids:
+        rows = conn.execute("SELECT cluster_id, vsum FROM clusters WHERE model=? AND size > 0", (model,)).fetchall()
+        ids = np.array([r["cluster_id"] for r in rows], dtype=np.int64)
+        mat = np.vstack([np.frombuffer(r["vsum"], dtype=np.float32) for r in rows]) if rows else None
+        if mat is not None:
+            mat = mat / np.clip(np.linalg.norm(mat, axis=1, keepdims=True), 1e-12, None)
+        _centroids[model] = (ids, mat)
+    return _centroids[model]
+
+
+def index_file(file_id: str, stats: Optional[dict] = None) -> int:
+    """
+    Segment the file's Risk Factors into items, embed them with the shared
+    MiniLM encoder (through the chunk embedding cache) and add them to the
+    corpus-wide clusters. Re-indexing a file replaces its items.
+    """
+    from services.embedding import EMBED_MODEL, EMBED_MODEL_KEY, load_sections
+    from nlp.embed_cache import encode_cached
+
+    text = "\n".join(d["text"] for d in load_sections(file_id) if d["section"].lower().startswith("risk"))
+    items = segment_risk_factors(text)
+    forget_file(file_id)
+    if not items:
+        return 0
+    vecs = encode_cached(EMBED_MODEL, EMBED_MODEL_KEY, [it["text"] for it in items])
+
+    new_clusters = 0
+    with _LOCK, get_conn() as conn:
+        c = conn.cursor()
+        ids, mat = _load_centroids(conn, EMBED_MODEL_KEY)
+        ids, mat = list(ids), (list(mat) if mat is not None else [])
+        for it, v in zip(items, vecs):
+            sims = np.asarray(mat) @ v if mat else np.zeros(0)
+            best = int(np.argmax(sims)) if len(sims) else -1
+            if best >= 0 and sims[best] >= CLUSTER_SIMILARITY:
+                cid = ids[best]
+                row = c.execute("SELECT vsum FROM clusters WHERE cluster_id=?", (cid,)).fetchone()
+                vsum = np.frombuffer(row["vsum"], dtype=np.float32) + v
+                c.execute("UPDATE clusters SET vsum=?, size=size+1 WHERE cluster_id=?", (vsum.tobytes(), cid))
+                mat[best] = vsum / max(np.linalg.norm(vsum), 1e-12)
+            else:
+                cid = c.execute("INSERT INTO clusters(model, label, vsum, size) VALUES(?,?,?,1)",
+                                (EMBED_MODEL_KEY, it["heading"], v.astype(np.float32).tobytes())).lastrowid
+                ids.append(cid)
+                mat.append(v)
+                new_clusters += 1
+            c.execute("INSERT INTO items(file_id, item_no, heading, cluster_id, vec) VALUES(?,?,?,?,?)",
+                      (file_id, it["no"], it["heading"], cid, v.astype(np.float32).tobytes()))
+        conn.commit()
+        _centroids.pop(EMBED_MODEL_KEY, None)
+
+    if stats is not None:
+        stats["risk_factors"] = len(items)
+        stats["risk_clusters_new"] = new_clusters
+    return len(items)
+
+
+def forget_file(file_id: str):
+    """Remove a file's items and take their vectors out of the cluster centroids."""
+    with _LOCK, get_conn() as conn:
+        c = conn.cursor()
+        rows = c.execute("SELECT cluster_id, vec FROM items WHERE file_id=?", (file_id,)).fetchall()
+        for r in rows:
+            old = c.execute("SELECT vsum FROM clusters WHERE cluster_id=?", (r["cluster_id"],)).fetchone()
+            vsum = np.frombuffer(old["vsum"], dtype=np.float32) - np.frombuffer(r["vec"], dtype=np.float32)
+            c.execute("UPDATE clusters SET vsum=?, size=size-1 WHERE cluster_id=?", (vsum.tobytes(), r["cluster_id"]))
+        c.execute("DELETE FROM items WHERE file_id=?", (file_id,))
+        conn.commit()
+        if rows:
+            _centroids.clear()
+
+
+def _cluster_files(c, cluster_id: int) -> list[str]:
+    return [r["file_id"] for r in c.execute(
+        "SELECT DISTINCT file_id FROM items WHERE cluster_id=? ORDER BY file_id", (cluster_id,))]
+
+
+def file_risk_factors(file_id: str) -> list[dict]:
+    """The file's risk factors with their cluster and how many IPOs share it."""
+    with get_conn() as conn:
+        rows = conn.execute("""
+            SELECT i.item_no, i.heading, i.cluster_id,
+                   (SELECT COUNT(DISTINCT j.file_id) FROM items j WHERE j.cluster_id = i.cluster_id) AS n_files
+            FROM items i WHERE i.file_id=? ORDER BY i.item_no
+        """, (file_id,)).fetchall()
+    return [dict(r) for r in rows]
+
+
+def unique_risks(file_id: str) -> list[dict]:
+    """Risk factors of this file that no other indexed IPO carries."""
+    return [r for r in file_risk_factors(file_id) if r["n_files"] == 1]
+
+
+def issuers_with_risk(query: str, top_k: int = 3) -> list[dict]:
+    """Clusters closest to `query` (a risk description) and the IPOs that carry each."""
+    from services.embedding import EMBED_MODEL, EMBED_MODEL_KEY
+    from nlp.query_embed import encode_query
+
+    q = encode_query(EMBED_MODEL, EMBED_MODEL_KEY, query)[0]
+    with get_conn() as conn:
+        ids, mat = _load_centroids(conn, EMBED_MODEL_KEY)
+        if mat is None:
+            return []
+        sims = mat @ q
+        out = []
+        for i in np.argsort(-sims)[:top_k]:
+            cid = int(ids[i])
+            label = conn.execute("SELECT label FROM clusters WHERE cluster_id=?", (cid,)).fetchone()["label"]
+            out.append({
+                "cluster_id": cid,
+                "label": label,
+                "similarity": round(float(sims[i]), 3),
+                "file_ids": _cluster_files(conn, cid),
+            })
+    return out
+
+
+init_db()
@@ -0,0 +1,113 @@
+"""
+Fast risk mode: a ridge regressor on the MiniLM chunk vectors already stored
+at ingest, distilled from FinBERT. It predicts, per Risk Factors chunk, the
+share of FinBERT-negative sentences and the mean class probabilities, so a
+document is scored without running any transformer.
+
+Train (offline, on already ingested files):
+
+    python -m services.risk_fast <file_id> [<file_id> ...]
+"""
+import argparse
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from nlp.sentences import split_sentences
+
+MODEL_PATH = Path("data/models/risk_fast.joblib")
+TARGETS = ["neg_ratio", "positive", "negative", "neutral"]
+
+_model = None
+
+
+class FastModelMismatch(Exception):
+    """The stored fast risk model does not fit the vectors of the current encoder."""
+
+
+def load_risk_chunks(file_id: str):
+    """(chunk metas, stored vectors) for the Risk Factors chunks of an indexed file."""
+    from services.embedding import load_chunk_vectors
+    meta, vecs = load_chunk_vectors(file_id)
+    rows = [i for i, c in enumerate(meta) if c["section"].lower().startswith("risk")]
+    return [meta[i] for i in rows], vecs[rows]
+
+
+def _sentence_count(text: str) -> int:
+    return max(1, len(split_sentences(text)))
+
+
+def load_model():
+    global _model
+    if _model is None:
+        if not MODEL_PATH.exists():
+            raise FileNotFoundError(
+                f"No fast risk model at {MODEL_PATH}; train it with `python -m services.risk_fast <file_ids>`"
+            )
+        _model = joblib.load(MODEL_PATH)
+    return _model
+
+
+def predict_chunks(file_id: str) -> pd.DataFrame:
+    """Per Risk Factors chunk: text, sentence count and predicted FinBERT aggregates."""
+    bundle = load_model()
+    from services.embedding import EMBED_MODEL_KEY
+    if bundle["encoder_key"] != EMBED_MODEL_KEY:
+        raise FastModelMismatch(f"Fast risk model was trained on {bundle['encoder_key']} vectors, index uses {EMBED_MODEL_KEY}")
+    metas, vecs = load_risk_chunks(file_id)
+    if not metas:
+        return pd.DataFrame(columns=["text", "n_sentences"] + TARGETS)
+    pred = np.clip(bundle["model"].predict(vecs), 0.0, 1.0)
+    df = pd.DataFrame(pred, columns=TARGETS)
+    df.insert(0, "text", [m["text"] for m in metas])
+    df.insert(1, "n_sentences", [_sentence_count(m["text"]) for m in metas])
+    return df
+
+
+def train(file_ids: list[str], alpha: float = 1.0) -> dict:
+    """Fit the regressor on FinBERT aggregates of every Risk Factors chunk of `file_ids`."""
+    from sklearn.linear_model import Ridge
+    from services.embedding import EMBED_MODEL_KEY
+    from services.risk import FINBERT, finbert_sentiment
+
+    X, y, w = [], [], []
+    for fid in file_ids:
+        metas, vecs = load_risk_chunks(fid)
+        for m, v in zip(metas, vecs):
+            df = finbert_sentiment(m["text"])
+            X.append(v)
+            y.append([(df["dominant"] == "Negative").mean(), df["positive"].mean(),
+                      df["negative"].mean(), df["neutral"].mean()])
+            w.append(len(df))
+        print(f"📚 {fid}: {len(metas)} risk chunks")
+    if not X:
+        raise ValueError("No Risk Factors chunks found in the given files")
+
+    X, y, w = np.vstack(X), np.array(y), np.array(w, dtype=float)
+    model = Ridge(alpha=alpha).fit(X, y, sample_weight=w)
+    r2 = model.score(X, y, sample_weight=w)
+    MODEL_PATH.parent.mkdir(parents=True, exist_ok=True)
+    joblib.dump({
+        "model": model,
+        "encoder_key": EMBED_MODEL_KEY,
+        "teacher": FINBERT.version,
+        "targets": TARGETS,
+        "n_chunks": len(X),
+    }, MODEL_PATH)
+    global _model
+    _model = None
+    return {"n_chunks": len(X), "train_r2": round(float(r2), 3), "path": str(MODEL_PATH)}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("file_ids", nargs="+", help="ingested files to distil FinBERT labels from")
+    ap.add_argument("--alpha", type=float, default=1.0, help="ridge regularization")
+    args = ap.parse_args()
+    print(train(args.file_ids, alpha=args.alpha))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import itertools
+import json
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from services.risk import analyze_risk, iter_analyze_risk
+from services import lexicon, risk_factors
+
+router = APIRouter()
+
+class RiskReq(BaseModel):
+    file_id: str
+    mode: str = "accurate"  # "accurate" (FinBERT) | "fast" (distilled, for screening)
+
+@router.post("/risk")
+def risk_endpoint(payload: RiskReq):
+    try:
+        return analyze_risk(payload.file_id, mode=payload.mode)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/risk/lexicon/{file_id}")
+def risk_lexicon_endpoint(file_id: str):
+    """Loughran-McDonald profile of the Risk Factors, stored at ingest (no model involved)."""
+    try:
+        profile = lexicon.file_profile(file_id)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    if profile is None:
+        raise HTTPException(status_code=503, detail="No Loughran-McDonald dictionary installed")
+    return {"file_id": file_id, "lexicon": profile}
+
+class IssuersReq(BaseModel):
+    query: str
+    top_k: int = 3
+
+@router.post("/risk/issuers")
+def risk_issuers_endpoint(payload: IssuersReq):
+    """Which IPOs carry this risk: nearest risk-factor clusters across the corpus."""
+    return {"query": payload.query, "clusters": risk_factors.issuers_with_risk(payload.query, payload.top_k)}
+
+@router.get("/risk/factors/{file_id}")
+def risk_factors_endpoint(file_id: str, unique: bool = False):
+    """The file's numbered risk factors; unique=true keeps those no other IPO carries."""
+    items = risk_factors.unique_risks(file_id) if unique else risk_factors.file_risk_factors(file_id)
+    return {"file_id": file_id, "risk_factors": items}
+
+
+def _sse(events):
+    for ev in events:
+        yield f"event: {ev['event']}\ndata: {json.dumps(ev, ensure_ascii=False)}\n\n"
+
+
+@router.get("/risk/stream/{file_id}")
+def risk_stream_endpoint(file_id: str):
+    """Server-sent events: running risk score after every FinBERT batch, then the final result."""
+    events = iter_analyze_risk(file_id)
+    try:
+        # surface missing corpus / section as HTTP errors before the stream starts
+        first = next(events)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return StreamingResponse(_sse(itertools.chain([first], events)), media_type="text/event-stream")
@@ -1,53 +1,81 @@
-import json
+import os
 from pathlib import Path
 from transformers import pipeline
 
+from nlp.batching import token_lengths
+from nlp.embed_cache import SENTENCE_CACHE, encode_cached
+from nlp.extractive import EXTRACT_TOKENS, preselect as extract
+from nlp.sentences import load_section_sentences
+from nlp.summarize import SUMMARY_CACHE, map_reduce, section_key, summarize_batched
+from services.embedding import EMBED_BATCH_SIZE, EMBED_MODEL, EMBED_MODEL_KEY
+
 CORPUS_DIR = Path("data/corpus")
 
-# Load summarization model
-SUMMARIZER = pipeline("summarization", model="facebook/bart-large-cnn")
+# Load summarization model (e.g. sshleifer/distilbart-cnn-12-6 for speed)
+SUMMARY_MODEL_NAME = os.environ.get("SUMMARY_MODEL", "facebook/bart-large-cnn")
+SUMMARIZER = pipeline("summarization", model=SUMMARY_MODEL_NAME)
+
+# Token lengths of the partial (map) and final section summaries
+MAP_SUMMARY_LEN = 120
+FINAL_SUMMARY_LEN = 200
 
 # Select sections you want to summarize
 TARGET_SECTIONS = ["Risk Factors", "Promoters", "Financial Statements", "Business", "MD&A"]
 
 def load_sections(file_id: str):
-    """Load section-wise text from the parsed corpus."""
-    path = CORPUS_DIR / f"{file_id}.jsonl"
-    if not path.exists():
-        raise FileNotFoundError(f"No parsed corpus found for {file_id}")
-    
+    """Sentences of each target section, from the offsets stored at ingest (whole sections)."""
     sections = {}
-    with open(path, "r", encoding="utf-8") as f:
-        for line in f:
-            d = json.loads(line.strip().replace("'", '"'))
-            section_name = d["section"]
-            if section_name in TARGET_SECTIONS:
-                text = d["text"].replace("\n", " ")
-                sections[section_name] = text[:12000]  # Limit for model input
+    for name, sentences in load_section_sentences(file_id):
+        if name in TARGET_SECTIONS:
+            sections.setdefault(name, []).extend(sentences)
     return sections
 
 
-def summarize_text(text: str, max_len=200):
-    """Summarize long text using transformer pipeline."""
-    try:
-        summary = SUMMARIZER(
-            text, max_length=max_len, min_length=60, do_sample=False
-        )[0]["summary_text"]
-        return summary.strip()
-    except Exception as e:
-        return f"⚠️ Summarization failed: {e}"
+def summarize_texts(texts: list[str], max_len=200, batch_size: int = 8, force: bool = False) -> list[str]:
+    """Summarize several texts in cached, length-bucketed batches (see nlp.summarize.summarize_batched)."""
+    return summarize_batched(SUMMARIZER, SUMMARY_MODEL_NAME, texts, max_len, 60, batch_size=batch_size, force=force)
+
 
+def preselect(sentences: list[str], budget: int = EXTRACT_TOKENS) -> list[str]:
+    """
+    The section's most central, mutually non-redundant sentences (MMR over
+    MiniLM sentence vectors, cached in SENTENCE_CACHE), in document
+    order, up to `budget` summarizer tokens.
+    """
+    lengths = token_lengths(sentences, SUMMARIZER.tokenizer)
+    return extract(sentences, lengths, lambda s: encode_cached(EMBED_MODEL, EMBED_MODEL_KEY, s,
+                                                               batch_size=EMBED_BATCH_SIZE, cache=SENTENCE_CACHE),
+                   budget)
 
-def generate_summaries(file_id: str):
-    """Generate summaries for key sections."""
+
+def generate_summaries(file_id: str, force: bool = False):
+    """
+    Generate summaries for key sections. Every sentence of a section is
+    ranked, the top EXTRACT_TOKENS worth are kept (preselect), and the
+    extract is summarized map-reduce style over token-budgeted windows,
+    all sections batched together per level. A section seen before with
+    the same model and lengths is served whole from SUMMARY_CACHE, the
+    windows are cached by content too; `force` regenerates.
+    """
     sections = load_sections(file_id)
-    results = {}
+    keys = {n: section_key(SUMMARY_MODEL_NAME, sents, EMBED_MODEL_KEY, EXTRACT_TOKENS, MAP_SUMMARY_LEN,
+                           FINAL_SUMMARY_LEN) for n, sents in sections.items()}
+    found = {} if force else SUMMARY_CACHE.get_many(list(keys.values()))
+    results = {n: found[k].decode("utf-8") for n, k in keys.items() if k in found}
+
+    names = [n for n in sections if n not in results]
+    if names:
+        print(f"📝 Summarizing {', '.join(names)}...")
+        summaries = map_reduce(
+            [preselect(sections[n]) for n in names],
+            lambda texts, max_len: summarize_texts(texts, max_len=max_len, force=force),
+            SUMMARIZER.tokenizer, map_len=MAP_SUMMARY_LEN, final_len=FINAL_SUMMARY_LEN,
+        )
+        results.update(zip(names, summaries))
+        SUMMARY_CACHE.put_many({keys[n]: s.encode("utf-8") for n, s in zip(names, summaries)
+                                if s and "⚠️ Summarization failed" not in s})
 
-    for section, text in sections.items():
-        print(f"📝 Summarizing {section}...")
-        results[section] = summarize_text(text)
-    
     return {
         "file_id": file_id,
-        "summaries": results
+        "summaries": {n: results[n] for n in sections}
     }
@@ -6,11 +6,12 @@ router = APIRouter()
 
 class SummaryReq(BaseModel):
     file_id: str
+    force: bool = False  # regenerate instead of serving stored summaries
 
 @router.post("/summary")
 def summary_endpoint(payload: SummaryReq):
     try:
-        result = generate_summaries(payload.file_id)
+        result = generate_summaries(payload.file_id, force=payload.force)
         return result
     except FileNotFoundError as e:
         raise HTTPException(status_code=404, detail=str(e))
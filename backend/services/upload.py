@@ -6,14 +6,20 @@ from fastapi import APIRouter, BackgroundTasks, File, Header, HTTPException, Upl
 from fastapi.responses import JSONResponse
 
 from models.schemas import UploadInitResp, UploadCompleteReq, JobStatusResp
-from store.db import upsert_file, set_status, get_status
+from store.db import upsert_file, set_status_if, get_status, set_parent
 from services.pipeline import process_pipeline
+from services import jobs
 
 TMP_DIR = Path("data/tmp")
 RAW_DIR = Path("data/raw")
 TMP_DIR.mkdir(parents=True, exist_ok=True)
 RAW_DIR.mkdir(parents=True, exist_ok=True)
 
+# job statuses while parts are coming in / the pipeline runs / once it has stopped
+UPLOADING = ("init", "uploaded")
+IN_FLIGHT = ("assembled", "parsing", "embedding", "cancelling")
+FINISHED = ("done", "error", "cancelled")
+
 router = APIRouter()
 
 @router.post("/upload/init", response_model=UploadInitResp)
@@ -35,6 +41,12 @@ def upload_chunk(
     if x_chunk_index < 0 or x_total_chunks < 1:
         raise HTTPException(status_code=400, detail="Invalid chunk headers")
 
+    status = get_status(x_file_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Unknown file_id")
+    if status not in UPLOADING:
+        raise HTTPException(status_code=409, detail=f"Upload is {status}; no more chunks accepted")
+
     part_dir = TMP_DIR / x_file_id
     part_dir.mkdir(parents=True, exist_ok=True)
 
@@ -42,14 +54,25 @@ def upload_chunk(
     with open(part_path, "wb") as out:
         shutil.copyfileobj(file.file, out)
 
-    set_status(x_file_id, "uploaded")
+    # cancelled (or completed) while this part was being written: drop it
+    if not set_status_if(x_file_id, "uploaded", UPLOADING):
+        if get_status(x_file_id) == "cancelled":
+            shutil.rmtree(part_dir, ignore_errors=True)
+        else:
+            part_path.unlink(missing_ok=True)
+        raise HTTPException(status_code=409, detail="Upload is no longer accepting chunks")
     return {"ok": True, "received_chunk": x_chunk_index, "total_chunks": x_total_chunks}
 
 @router.post("/upload/complete")
 def upload_complete(payload: UploadCompleteReq, background: BackgroundTasks):
     part_dir = TMP_DIR / payload.file_id
+    status = get_status(payload.file_id)
+    if status is not None and status not in UPLOADING:
+        raise HTTPException(status_code=409, detail=f"Upload is {status}")
     if not part_dir.exists():
         raise HTTPException(status_code=400, detail="No chunks found for file_id")
+    if payload.previous_file_id and get_status(payload.previous_file_id) != "done":
+        raise HTTPException(status_code=400, detail="previous_file_id is unknown or not processed")
 
     dest = RAW_DIR / f"{payload.file_id}.pdf"
     # assemble parts in order (0..total_chunks-1)
@@ -61,11 +84,40 @@ def upload_complete(payload: UploadCompleteReq, background: BackgroundTasks):
             with open(part_path, "rb") as fin:
                 shutil.copyfileobj(fin, fout)
 
+    # a cancel that landed while assembling wins
+    if status is not None and not set_status_if(payload.file_id, "assembled", UPLOADING):
+        dest.unlink(missing_ok=True)
+        raise HTTPException(status_code=409, detail="Upload was cancelled")
     upsert_file(payload.file_id, payload.filename, status="assembled")
+    set_parent(payload.file_id, payload.previous_file_id)
     # kick background processing
     background.add_task(process_pipeline, payload.file_id)
     return {"job_id": payload.file_id, "message": "Processing started"}
 
+@router.post("/cancel/{job_id}")
+def cancel(job_id: str):
+    # the status only moves if the job is still where we saw it; if the
+    # pipeline got there first, look again
+    for _ in range(3):
+        status = get_status(job_id)
+        if status is None:
+            raise HTTPException(status_code=404, detail="Unknown job_id")
+        if status in FINISHED:
+            return {"job_id": job_id, "status": status, "message": "Job already finished"}
+        if status in IN_FLIGHT:
+            # in flight: the pipeline stops at its next checkpoint and cleans up
+            if set_status_if(job_id, "cancelling", IN_FLIGHT):
+                jobs.request_cancel(job_id)
+                if get_status(job_id) in FINISHED:
+                    # finished before it saw the flag; nobody else will clear it
+                    jobs.clear(job_id)
+                return {"job_id": job_id, "status": "cancelling", "message": "Cancellation requested"}
+        elif set_status_if(job_id, "cancelled", (status,)):
+            # still uploading: nothing is running, drop the parts right away
+            jobs.cleanup_artifacts(job_id)
+            return {"job_id": job_id, "status": "cancelled", "message": "Upload cancelled"}
+    raise HTTPException(status_code=409, detail="Job status keeps changing; try again")
+
 @router.get("/status/{job_id}", response_model=JobStatusResp)
 def status(job_id: str):
     status = get_status(job_id)
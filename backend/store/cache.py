@@ -0,0 +1,111 @@
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+# CACHE_DIR, else <DATA_DIR>/cache (the legacy app's writable volume), else ./data/cache.
+# Nothing is created here: each cache makes its directory on first use.
+CACHE_DIR = Path(
+    os.environ.get("CACHE_DIR")
+    or (Path(os.environ["DATA_DIR"]) / "cache" if os.environ.get("DATA_DIR") else Path("data/cache"))
+)
+
+
+class KVCache:
+    """
+    Persistent, size-bounded key/value cache on SQLite with LRU eviction.
+    Values are bytes; callers handle (de)serialization. The database is
+    opened (and its directory created) on first access, not at import.
+    """
+
+    def __init__(self, path: Path, max_bytes: int):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._total = 0
+        self._ready = False
+
+    def _init_db(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with sqlite3.connect(self.path, timeout=30) as conn:
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries(
+                key TEXT PRIMARY KEY,
+                value BLOB,
+                size INTEGER,
+                last_used REAL
+            );
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries(last_used)")
+            self._total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        self._ready = True
+
+    def _conn(self):
+        # callers hold self._lock
+        if not self._ready:
+            self._init_db()
+        return sqlite3.connect(self.path, timeout=30)
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock, self._conn() as conn:
+            row = conn.execute("SELECT value FROM entries WHERE key=?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            conn.execute("UPDATE entries SET last_used=? WHERE key=?", (time.time(), key))
+            self.hits += 1
+            return row[0]
+
+    def get_many(self, keys: list[str]) -> dict[str, bytes]:
+        """Batched get; returns only the keys that were found."""
+        found: dict[str, bytes] = {}
+        with self._lock, self._conn() as conn:
+            for i in range(0, len(keys), 500):  # stay under SQLite's parameter limit
+                part = keys[i:i + 500]
+                marks = ",".join("?" * len(part))
+                found.update(conn.execute(f"SELECT key, value FROM entries WHERE key IN ({marks})", part).fetchall())
+            now = time.time()
+            conn.executemany("UPDATE entries SET last_used=? WHERE key=?", [(now, k) for k in found])
+        self.hits += len(found)
+        self.misses += len(set(keys)) - len(found)
+        return found
+
+    def put_many(self, items: dict[str, bytes]):
+        with self._lock, self._conn() as conn:
+            now = time.time()
+            for key, value in items.items():
+                old = conn.execute("SELECT size FROM entries WHERE key=?", (key,)).fetchone()
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries(key, value, size, last_used) VALUES(?,?,?,?)",
+                    (key, value, len(value), now),
+                )
+                self._total += len(value) - (old[0] if old else 0)
+            if self._total > self.max_bytes:
+                self._evict(conn)
+
+    def put(self, key: str, value: bytes):
+        self.put_many({key: value})
+
+    def _evict(self, conn):
+        """Drop least recently used entries until back under 90% of the budget."""
+        target = int(self.max_bytes * 0.9)
+        doomed = []
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY last_used"):
+            if self._total <= target:
+                break
+            doomed.append((key,))
+            self._total -= size
+        conn.executemany("DELETE FROM entries WHERE key=?", doomed)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "bytes": self._total,
+        }
@@ -19,10 +19,15 @@ def init_db():
             filename TEXT,
             pages INTEGER,
             status TEXT,
+            parent_id TEXT,
             created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
             updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
         );
         """)
+        # databases created before parent_id existed
+        cols = {r["name"] for r in c.execute("PRAGMA table_info(files)").fetchall()}
+        if "parent_id" not in cols:
+            c.execute("ALTER TABLE files ADD COLUMN parent_id TEXT")
         conn.commit()
 
 def upsert_file(file_id: str, filename: str, status: str):
@@ -44,6 +49,31 @@ def set_status(file_id: str, status: str):
         c.execute("UPDATE files SET status=?, updated_at=CURRENT_TIMESTAMP WHERE file_id=?", (status, file_id))
         conn.commit()
 
+def set_status_if(file_id: str, status: str, allowed) -> bool:
+    """Set the status only if the current one is in `allowed`; True if it changed."""
+    allowed = tuple(allowed)
+    with get_conn() as conn:
+        c = conn.cursor()
+        c.execute(
+            f"UPDATE files SET status=?, updated_at=CURRENT_TIMESTAMP WHERE file_id=? AND status IN ({','.join('?' * len(allowed))})",
+            (status, file_id, *allowed),
+        )
+        conn.commit()
+        return c.rowcount > 0
+
+def set_parent(file_id: str, parent_id: Optional[str]):
+    """Link a file to an earlier version of the same document (e.g. RHP -> DRHP)."""
+    with get_conn() as conn:
+        c = conn.cursor()
+        c.execute("UPDATE files SET parent_id=?, updated_at=CURRENT_TIMESTAMP WHERE file_id=?", (parent_id, file_id))
+        conn.commit()
+
+def get_parent(file_id: str) -> Optional[str]:
+    with get_conn() as conn:
+        c = conn.cursor()
+        r = c.execute("SELECT parent_id FROM files WHERE file_id=?", (file_id,)).fetchone()
+        return r["parent_id"] if r else None
+
 def get_status(file_id: str) -> Optional[str]:
     with get_conn() as conn:
         c = conn.cursor()
@@ -0,0 +1,18 @@
+from services.lexicon import Lexicon
+
+
+def uncertainty():
+    words = ["risk", "risks", "depend", "dependence", "may"]
+    return Lexicon({w: {"uncertainty"} for w in words}, categories=["uncertainty"],
+                   base={"risks": "risk", "dependence": "depend"})
+
+
+def test_distinct_counts_each_base_form_once_per_sentence():
+    hits, words = uncertainty().count(["Risk risks and more risks.", "We may depend on dependence."], distinct=True)
+    assert hits[:, 0].tolist() == [1, 2]
+    assert words.tolist() == [5, 5]
+
+
+def test_counts_every_occurrence_by_default():
+    hits, _ = uncertainty().count(["Risk risks and more risks.", "The mayor may act."])
+    assert hits[:, 0].tolist() == [3, 1]
@@ -0,0 +1,49 @@
+from services.risk_factors import segment_risk_factors
+
+
+def headings(text):
+    return [it["heading"] for it in segment_risk_factors(text)]
+
+
+def test_nested_list_stays_inside_its_item():
+    text = (
+        "1. Our business depends on a few customers. Our key customers are:\n"
+        "1. ABC Ltd.\n"
+        "2. DEF Ltd.\n"
+        "2. We face intense competition. Competitors may cut prices.\n"
+    )
+    items = segment_risk_factors(text)
+    assert [it["heading"] for it in items] == [
+        "Our business depends on a few customers.",
+        "We face intense competition.",
+    ]
+    assert "ABC Ltd." in items[0]["text"] and "DEF Ltd." in items[0]["text"]
+    assert "DEF" not in items[1]["text"]
+
+
+def test_nested_list_as_long_as_the_remaining_items():
+    text = (
+        "1. Demand may fall. Text.\n"
+        "2. We rely on suppliers. Our suppliers include:\n"
+        "1. Alpha Corp.\n"
+        "2. Beta Corp.\n"
+        "3. Gamma Corp.\n"
+        "3. Rates may rise. Text.\n"
+        "4. Key staff may leave. Text.\n"
+    )
+    assert headings(text) == [
+        "Demand may fall.", "We rely on suppliers.", "Rates may rise.", "Key staff may leave.",
+    ]
+
+
+def test_restart_after_sub_heading():
+    text = (
+        "Internal Risks\n"
+        "1. We depend on one plant. Text.\n"
+        "2. Suppliers may fail. Text.\n"
+        "External Risks\n"
+        "1. Macro conditions may worsen. Text.\n"
+        "2. The rupee may fall. Text.\n"
+        "3. Regulation may change. Text.\n"
+    )
+    assert len(segment_risk_factors(text)) == 5
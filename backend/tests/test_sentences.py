@@ -0,0 +1,30 @@
+from nlp.sentences import split_sentences
+
+
+def test_list_number_joins_the_sentence_after_it():
+    text = "RISK FACTORS\n\n1. We depend on a few customers. 2. Competition is intense."
+    assert split_sentences(text) == [
+        "RISK FACTORS",
+        "1. We depend on a few customers.",
+        "2. Competition is intense.",
+    ]
+
+
+def test_lettered_and_roman_enumerators():
+    assert split_sentences("(a) Our plant may shut. (b) Power may fail. IV. Rates may rise.") == [
+        "(a) Our plant may shut.", "(b) Power may fail.", "IV. Rates may rise.",
+    ]
+
+
+def test_month_abbreviations_do_not_end_sentences():
+    text = "Restated profit for the year ended Mar. 31, 2024 rose. Debt fell by Sept. 30."
+    assert split_sentences(text) == [
+        "Restated profit for the year ended Mar. 31, 2024 rose.",
+        "Debt fell by Sept. 30.",
+    ]
+
+
+def test_existing_abbreviations():
+    assert split_sentences("XYZ Pvt. Ltd. paid Rs. 10 crore. No. 5 is next.") == [
+        "XYZ Pvt. Ltd. paid Rs. 10 crore.", "No. 5 is next.",
+    ]